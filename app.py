@@ -25,29 +25,34 @@ Usage:
     python app.py
     # Open http://localhost:5001 in browser
 """
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from flask import Flask, g, render_template, request, jsonify, send_file, send_from_directory
 from pathlib import Path
-import json
 import logging
-from datetime import datetime
-from downloader import YouTubeDownloader
-from separator import VocalSeparator
-from lyrics_extractor import LyricsExtractor
-from video_generator import KaraokeVideoGenerator
+import os
+import uuid
+import threading
+from json_provider import OrjsonProvider
+from session_store import SESSION_COOKIE, SessionStore, StoredSession
+from pipeline import TEMP_DIR, get_downloader, get_generator, get_separator, load_or_extract_lyrics
+from utils import karaoke_filename
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Behind a front-end server that supports X-Sendfile (Apache, lighttpd),
+# let it stream the audio files instead of Python
+app.use_x_sendfile = os.getenv('USE_X_SENDFILE') == '1'
 
 # Directories
-TEMP_DIR = Path('/tmp/karaoke-temp')
 OUTPUT_DIR = Path.home() / 'Downloads'
-TEMP_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Session state
-session = {
+# Per-browser session state, keyed by a cookie and kept in sqlite
+# so concurrent users don't overwrite each other's files
+sessions = SessionStore(TEMP_DIR / 'sessions.db', defaults={
     'youtube_url': None,
     'audio_path': None,
     'instrumental_path': None,
@@ -55,7 +60,28 @@ session = {
     'auto_lyrics': None,
     'final_lyrics': None,
     'video_path': None
-}
+})
+
+
+def current_session() -> StoredSession:
+    """Return the session of the requesting browser, starting one if needed"""
+    if 'sid' not in g:
+        g.sid = request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+    return sessions.get(g.sid)
+
+
+@app.after_request
+def set_session_cookie(response):
+    """Hand a new session id to browsers that don't have one yet"""
+    if 'sid' in g and request.cookies.get(SESSION_COOKIE) != g.sid:
+        response.set_cookie(SESSION_COOKIE, g.sid, httponly=True, samesite='Lax')
+    return response
+
+
+# Demucs and Whisper each use every core, so running both at once only
+# thrashes; one model step runs at a time and overlapping requests get a 429
+_model_slot = threading.Semaphore(1)
+BUSY_RESPONSE = {'error': 'Another separation or transcription is running, please try again shortly'}
 
 
 @app.route('/')
@@ -67,6 +93,7 @@ def index():
 @app.route('/api/download', methods=['POST'])
 def download():
     """Step 1: Download from YouTube"""
+    session = current_session()
     try:
         data = request.json
         youtube_url = data.get('url')
@@ -75,7 +102,7 @@ def download():
             return jsonify({'error': 'No URL provided'}), 400
 
         logger.info(f"Downloading: {youtube_url}")
-        downloader = YouTubeDownloader(TEMP_DIR)
+        downloader = get_downloader()
         result = downloader.download(youtube_url)
 
         session['youtube_url'] = youtube_url
@@ -95,13 +122,19 @@ def download():
 @app.route('/api/separate', methods=['POST'])
 def separate():
     """Step 2: Separate vocals"""
+    session = current_session()
     try:
         if not session['audio_path']:
             return jsonify({'error': 'No audio loaded'}), 400
 
-        logger.info("Separating vocals...")
-        separator = VocalSeparator(TEMP_DIR)
-        result = separator.separate(session['audio_path'])
+        if not _model_slot.acquire(blocking=False):
+            return jsonify(BUSY_RESPONSE), 429
+        try:
+            logger.info("Separating vocals...")
+            separator = get_separator()
+            result = separator.separate(session['audio_path'])
+        finally:
+            _model_slot.release()
 
         session['instrumental_path'] = result['instrumental']
 
@@ -115,13 +148,18 @@ def separate():
 @app.route('/api/extract-lyrics', methods=['POST'])
 def extract_lyrics():
     """Step 3: Auto-extract lyrics (optional)"""
+    session = current_session()
     try:
         if not session['audio_path']:
             return jsonify({'error': 'No audio loaded'}), 400
 
-        logger.info("Extracting lyrics...")
-        extractor = LyricsExtractor()
-        result = extractor.extract(session['audio_path'])
+        if not _model_slot.acquire(blocking=False):
+            return jsonify(BUSY_RESPONSE), 429
+        try:
+            logger.info("Extracting lyrics...")
+            result = load_or_extract_lyrics(session['audio_path'])
+        finally:
+            _model_slot.release()
 
         lyrics = []
         for segment in result['segments']:
@@ -151,12 +189,12 @@ def serve_audio(filename):
         # Serve from temp directory
         file_path = TEMP_DIR / filename
         if file_path.exists():
-            return send_file(str(file_path))
+            return send_file(str(file_path), conditional=True, etag=True, max_age=3600)
 
         # Or from full path
         file_path = Path(filename)
         if file_path.exists():
-            return send_file(str(file_path))
+            return send_file(str(file_path), conditional=True, etag=True, max_age=3600)
 
         return jsonify({'error': 'File not found'}), 404
     except Exception as e:
@@ -167,6 +205,7 @@ def serve_audio(filename):
 @app.route('/api/save-lyrics', methods=['POST'])
 def save_lyrics():
     """Step 4: Save finalized lyrics"""
+    session = current_session()
     try:
         data = request.json
         lyrics = data.get('lyrics', [])
@@ -183,6 +222,7 @@ def save_lyrics():
 @app.route('/api/generate', methods=['POST'])
 def generate():
     """Step 5: Generate karaoke video"""
+    session = current_session()
     try:
         if not session['instrumental_path']:
             return jsonify({'error': 'No instrumental track'}), 400
@@ -198,12 +238,10 @@ def generate():
         }
 
         # Create output path
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        safe_title = "".join(c for c in session['title'] if c.isalnum() or c in (' ', '-', '_')).strip()
-        output_filename = f"{safe_title}_{timestamp}_karaoke.mp4"
+        output_filename = karaoke_filename(session['title'])
         output_path = OUTPUT_DIR / output_filename
 
-        generator = KaraokeVideoGenerator()
+        generator = get_generator()
         generator.generate(
             audio_path=session['instrumental_path'],
             lyrics_data=lyrics_data,
@@ -226,6 +264,7 @@ def generate():
 @app.route('/api/status')
 def status():
     """Get current session status"""
+    session = current_session()
     return jsonify({
         'title': session.get('title'),
         'has_audio': session.get('audio_path') is not None,
@@ -250,4 +289,7 @@ if __name__ == '__main__':
     print("\nPress Ctrl+C to stop the server")
     print("="*70 + "\n")
 
-    app.run(debug=True, port=5001)
+    # Waitress serves range requests and concurrent audio streams without
+    # blocking the long-running API calls
+    from waitress import serve
+    serve(app, host=os.getenv('HOST', '127.0.0.1'), port=5001, threads=8)
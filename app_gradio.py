@@ -14,33 +14,18 @@ Workflow:
 
 import gradio as gr
 from pathlib import Path
-import json
 import logging
-import tempfile
-import os
-from datetime import datetime
+import re
 
 # Import our modules
-from downloader import YouTubeDownloader
-from separator import VocalSeparator
-from lyrics_extractor import LyricsExtractor
-from video_generator import KaraokeVideoGenerator
+from pipeline import TEMP_DIR, get_downloader, get_generator, get_separator, load_or_extract_lyrics
+from utils import karaoke_filename
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Directories
-TEMP_DIR = Path(tempfile.gettempdir()) / 'karaoke-temp'
-TEMP_DIR.mkdir(parents=True, exist_ok=True)
-
-# Session state
-session = {
-    'youtube_url': None,
-    'audio_path': None,
-    'instrumental_path': None,
-    'title': None,
-    'auto_lyrics': None,
-}
+# One lyric line, optionally timed as: [start - end] text
+_LYRIC_LINE_RE = re.compile(r'^(?:\[(\d+\.?\d*)[^\S\n]*-[^\S\n]*(\d+\.?\d*)\])?(.*)$', re.MULTILINE)
 
 
 def download_from_youtube(url: str, progress=gr.Progress()):
@@ -52,14 +37,10 @@ def download_from_youtube(url: str, progress=gr.Progress()):
         progress(0.1, desc="Starting download...")
         logger.info(f"Downloading: {url}")
         
-        downloader = YouTubeDownloader(TEMP_DIR)
+        downloader = get_downloader()
         progress(0.3, desc="Fetching video info...")
         result = downloader.download(url)
         
-        session['youtube_url'] = url
-        session['audio_path'] = result['audio_path']
-        session['title'] = result['title']
-        
         progress(1.0, desc="Complete!")
         
         return (
@@ -81,13 +62,11 @@ def separate_vocals(audio_path: str, progress=gr.Progress()):
     
     try:
         progress(0.1, desc="Loading Demucs model...")
-        separator = VocalSeparator(TEMP_DIR)
+        separator = get_separator()
         
         progress(0.3, desc="Separating vocals (this takes 2-5 minutes)...")
         result = separator.separate(audio_path)
         
-        session['instrumental_path'] = result['instrumental']
-        
         progress(1.0, desc="Complete!")
         
         return (
@@ -109,10 +88,8 @@ def extract_lyrics(audio_path: str, progress=gr.Progress()):
     
     try:
         progress(0.1, desc="Loading Whisper model...")
-        extractor = LyricsExtractor()
-        
         progress(0.3, desc="Transcribing audio (this takes 1-3 minutes)...")
-        result = extractor.extract(audio_path)
+        result = load_or_extract_lyrics(audio_path)
         
         # Format lyrics for display and editing
         lyrics_text = ""
@@ -128,8 +105,6 @@ def extract_lyrics(audio_path: str, progress=gr.Progress()):
                 'text': text
             })
         
-        session['auto_lyrics'] = lyrics_data
-        
         progress(1.0, desc="Complete!")
         
         detected_lang = result.get('language', 'unknown')
@@ -145,30 +120,19 @@ def extract_lyrics(audio_path: str, progress=gr.Progress()):
 
 def parse_lyrics_text(lyrics_text: str):
     """Parse lyrics text back to structured format"""
-    import re
-    lyrics = []
-    
-    for line in lyrics_text.strip().split('\n'):
-        if not line.strip():
-            continue
-        
-        # Try to parse [start - end] text format
-        match = re.match(r'\[(\d+\.?\d*)\s*-\s*(\d+\.?\d*)\]\s*(.*)', line)
-        if match:
-            lyrics.append({
-                'start': float(match.group(1)),
-                'end': float(match.group(2)),
-                'text': match.group(3).strip()
-            })
-        else:
-            # Just text, use auto timing
-            lyrics.append({
-                'start': len(lyrics) * 3.0,  # Simple 3-second intervals
-                'end': len(lyrics) * 3.0 + 2.5,
-                'text': line.strip()
-            })
-    
-    return lyrics
+    # One regex pass over the whole text; untimed lines get 3-second slots.
+    # The text is stripped first, so an indented first line still parses as timed
+    lines = [
+        (start, end, text.strip())
+        for start, end, text in _LYRIC_LINE_RE.findall(lyrics_text.strip())
+        if start or text.strip()
+    ]
+    return [
+        {'start': float(start), 'end': float(end), 'text': text}
+        if start else
+        {'start': i * 3.0, 'end': i * 3.0 + 2.5, 'text': text}
+        for i, (start, end, text) in enumerate(lines)
+    ]
 
 
 def generate_video(instrumental_path: str, lyrics_text: str, title: str, progress=gr.Progress()):
@@ -190,13 +154,11 @@ def generate_video(instrumental_path: str, lyrics_text: str, title: str, progres
         
         # Create output path
         progress(0.2, desc="Setting up video generation...")
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        safe_title = "".join(c for c in (title or "karaoke") if c.isalnum() or c in (' ', '-', '_')).strip()
-        output_filename = f"{safe_title}_{timestamp}_karaoke.mp4"
+        output_filename = karaoke_filename(title or "karaoke")
         output_path = TEMP_DIR / output_filename
         
         progress(0.3, desc="Generating video (this takes 3-5 minutes)...")
-        generator = KaraokeVideoGenerator()
+        generator = get_generator()
         generator.generate(
             audio_path=instrumental_path,
             lyrics_data=lyrics_data,
@@ -3,65 +3,262 @@
 All-in-one Karaoke Maker Web App with Progress Tracking
 Complete workflow: Download → Separate → Time Lyrics → Generate Video
 """
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
 from pathlib import Path
-import json
 import logging
+import os
+import multiprocessing
 import threading
-from datetime import datetime
-from downloader import YouTubeDownloader
-from separator import VocalSeparator
-from lyrics_extractor import LyricsExtractor
-from video_generator import KaraokeVideoGenerator
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from json_provider import OrjsonProvider
+from session_store import SESSION_COOKIE, SessionStore, StoredSession
+from pipeline import TEMP_DIR, get_downloader, get_generator, get_separator, load_or_extract_lyrics
+from utils import karaoke_filename, limit_cpu_threads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Behind a front-end server that supports X-Sendfile (Apache, lighttpd),
+# let it stream the audio files instead of Python
+app.use_x_sendfile = os.getenv('USE_X_SENDFILE') == '1'
 
 # Directories
-TEMP_DIR = Path('/tmp/karaoke-temp')
 OUTPUT_DIR = Path.home() / 'Downloads'
-TEMP_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Session state
-session = {
+# Per-browser session state, keyed by a cookie and kept in sqlite
+# so concurrent users don't overwrite each other's files
+sessions = SessionStore(TEMP_DIR / 'sessions.db', defaults={
     'youtube_url': None,
     'audio_path': None,
     'instrumental_path': None,
     'title': None,
     'auto_lyrics': None,
     'final_lyrics': None,
-    'video_path': None
-}
-
-# Progress tracking (global since we're single-user for now)
-progress = {
-    'task': None,        # 'download', 'separate', 'extract', 'generate'
-    'status': 'idle',    # 'idle', 'running', 'complete', 'error'
-    'progress': 0,       # 0-100
-    'message': '',
-    'error': None,
-    'result': None
-}
-
-
-def update_progress(task=None, status=None, progress_percent=None, message=None, error=None, result=None):
-    """Update progress state"""
-    global progress
+    'video_path': None,
+    'task_id': None
+})
+
+
+def current_session() -> StoredSession:
+    """Return the session of the requesting browser, starting one if needed"""
+    if 'sid' not in g:
+        g.sid = request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+    return sessions.get(g.sid)
+
+
+@app.after_request
+def set_session_cookie(response):
+    """Hand a new session id to browsers that don't have one yet"""
+    if 'sid' in g and request.cookies.get(SESSION_COOKIE) != g.sid:
+        response.set_cookie(SESSION_COOKIE, g.sid, httponly=True, samesite='Lax')
+    return response
+
+
+# Heavy steps run in worker processes (one pool per task type, so each model
+# stays warm in exactly one process). Progress lives in a manager dict keyed
+# by task id so workers can report into it and concurrent tasks don't clobber
+# each other. Both are created lazily so spawned workers don't recreate them.
+_pools = {}
+_manager = None
+
+# Separation and transcription can run at the same time in their own
+# processes; each gets half the cores so the thread pools don't oversubscribe
+WORKER_THREADS = max(1, (os.cpu_count() or 2) // 2)
+_progress_store = None
+# Latest task of any session; only the progress monitor follows it (without
+# results), everything else goes through the session's own task id
+_latest_task_id = None
+_runtime_lock = threading.Lock()
+
+# Wakes /api/progress/stream listeners on updates made in this process;
+# updates written by worker processes are picked up by the periodic recheck
+_progress_changed = threading.Condition()
+STREAM_RECHECK_SECONDS = 0.5
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Streams without a task of their own (the progress monitor) end after this
+# long without a change and ask the browser to reconnect this much later,
+# so idle monitor tabs don't keep server threads
+STREAM_MONITOR_IDLE_SECONDS = 60
+STREAM_MONITOR_RETRY_SECONDS = 30
+
+# Origins allowed to read the progress stream cross-origin; 'null' is what
+# browsers send for progress_monitor.html opened from disk
+PROGRESS_MONITOR_ORIGINS = os.getenv('PROGRESS_MONITOR_ORIGINS', 'null').split(',')
+
+
+def get_pool(task: str) -> ProcessPoolExecutor:
+    """Return the worker pool for a task type, starting it on first use"""
+    with _runtime_lock:
+        if task not in _pools:
+            _pools[task] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=limit_cpu_threads,
+                initargs=(WORKER_THREADS,)
+            )
+        return _pools[task]
+
+
+def get_progress_store():
+    """Return the shared progress dict, starting the manager on first use"""
+    global _manager, _progress_store
+    with _runtime_lock:
+        if _progress_store is None:
+            _manager = multiprocessing.get_context('spawn').Manager()
+            _progress_store = _manager.dict()
+        return _progress_store
+
+
+def new_progress(task=None):
+    """Return a fresh progress state"""
+    return {
+        'task': task,        # 'download', 'separate', 'extract', 'generate'
+        'status': 'idle',    # 'idle', 'running', 'complete', 'error'
+        'progress': 0,       # 0-100
+        'message': '',
+        'error': None,
+        'result': None
+    }
+
+
+def update_progress(store, task_id, task=None, status=None, progress_percent=None, message=None, error=None, result=None):
+    """Update progress state for a task"""
+    # Manager dict values are copies, so read-modify-write the whole entry
+    state = dict(store.get(task_id) or new_progress())
     if task is not None:
-        progress['task'] = task
+        state['task'] = task
     if status is not None:
-        progress['status'] = status
+        state['status'] = status
     if progress_percent is not None:
-        progress['progress'] = progress_percent
+        state['progress'] = progress_percent
     if message is not None:
-        progress['message'] = message
+        state['message'] = message
     if error is not None:
-        progress['error'] = error
+        state['error'] = error
     if result is not None:
-        progress['result'] = result
+        state['result'] = result
+    store[task_id] = state
+
+    with _progress_changed:
+        _progress_changed.notify_all()
+
+
+def start_task(session, task, worker, args, on_complete):
+    """
+    Run a worker in the task's process pool and track its progress
+
+    Args:
+        session: Session of the browser starting the task; it remembers the
+                 task as its latest
+        task: Task name ('download', 'separate', 'extract', 'generate')
+        worker: Top-level worker function, called as worker(store, task_id, *args)
+        args: Extra picklable arguments for the worker
+        on_complete: Called in this process as on_complete(store, task_id, result)
+
+    Returns:
+        Task id to poll with /api/progress?id=<task_id>
+    """
+    global _latest_task_id
+    store = get_progress_store()
+    task_id = uuid.uuid4().hex
+    update_progress(store, task_id, task, 'running', 0, 'Queued...')
+    session['task_id'] = task_id
+    _latest_task_id = task_id
+
+    def done(future):
+        try:
+            result = future.result()
+            on_complete(store, task_id, result)
+        except Exception as e:
+            logger.error(f"{task.capitalize()} error: {e}")
+            update_progress(store, task_id, task, 'error', 0, str(e), error=str(e))
+            if isinstance(e, BrokenProcessPool):
+                # Start a fresh worker on the next request
+                with _runtime_lock:
+                    _pools.pop(task, None)
+
+    future = get_pool(task).submit(_run_worker, worker, store, task_id, *args)
+    future.add_done_callback(done)
+    return task_id
+
+
+def _run_worker(worker, store, task_id, *args):
+    """Run a worker, re-raising failures as plain RuntimeErrors"""
+    # Library exceptions don't always survive pickling back to the parent,
+    # and an unpicklable result breaks the whole pool
+    try:
+        return worker(store, task_id, *args)
+    except Exception as e:
+        raise RuntimeError(str(e)) from None
+
+
+def _download_worker(store, task_id, youtube_url):
+    """Download audio in a worker process"""
+    update_progress(store, task_id, 'download', 'running', 0, 'Downloading from YouTube...')
+    return get_downloader().download(youtube_url)
+
+
+def _separate_worker(store, task_id, audio_path):
+    """Separate vocals in a worker process"""
+    update_progress(store, task_id, 'separate', 'running', 0, 'Separating vocals (2-3 minutes)...')
+    return get_separator().separate(audio_path)
+
+
+def _extract_worker(store, task_id, audio_path):
+    """Extract lyrics in a worker process"""
+    update_progress(store, task_id, 'extract', 'running', 0, 'Extracting lyrics...')
+    result = load_or_extract_lyrics(audio_path)
+
+    lyrics = []
+    for segment in result['segments']:
+        lyrics.append({
+            'start': segment['start'],
+            'end': segment['end'],
+            'text': segment['text']
+        })
+
+    return {
+        'lyrics': lyrics,
+        'language': result.get('language', 'unknown')
+    }
+
+
+def _generate_worker(store, task_id, instrumental_path, lyrics, title):
+    """Generate the karaoke video in a worker process"""
+    update_progress(store, task_id, 'generate', 'running', 0, 'Preparing video generation...')
+
+    # Convert lyrics to expected format
+    lyrics_data = {
+        'segments': lyrics
+    }
+
+    # Create output path
+    output_filename = karaoke_filename(title)
+    output_path = OUTPUT_DIR / output_filename
+
+    update_progress(store, task_id, 'generate', 'running', 10, 'Creating lyric segments...')
+
+    generator = get_generator()
+
+    # Note: We can't easily get progress from video_generator
+    # So we'll just update at major milestones
+    update_progress(store, task_id, 'generate', 'running', 30, 'Generating lyric frames...')
+
+    generator.generate(
+        audio_path=instrumental_path,
+        lyrics_data=lyrics_data,
+        output_path=str(output_path),
+        title=title
+    )
+
+    return str(output_path)
 
 
 @app.route('/')
@@ -72,13 +269,85 @@ def index():
 
 @app.route('/api/progress')
 def get_progress():
-    """Get current progress"""
-    return jsonify(progress)
+    """Get progress for a task (?id=<task_id>), defaulting to this session's latest task"""
+    task_id = request.args.get('id') or current_session()['task_id']
+    if task_id is None:
+        return jsonify(new_progress())
+
+    state = get_progress_store().get(task_id)
+    if state is None:
+        return jsonify({'error': 'Unknown task id'}), 404
+
+    return jsonify(dict(state, task_id=task_id))
+
+
+@app.route('/api/progress/stream')
+def progress_stream():
+    """
+    Stream progress as Server-Sent Events (?id=<task_id>)
+
+    Without an id the stream follows this session's latest task. Either way
+    it ends once that task completes or fails. A caller with no task of its
+    own (progress_monitor.html) follows the latest task of any session,
+    without task ids, until nothing has changed for a while.
+    """
+    requested_id = request.args.get('id') or current_session()['task_id']
+    store = get_progress_store()
+
+    if requested_id and store.get(requested_id) is None:
+        if request.args.get('id'):
+            return jsonify({'error': 'Unknown task id'}), 404
+        # The session's task is from before a restart
+        requested_id = None
+
+    def event_stream():
+        last_state = None
+        idle = 0.0
+        quiet = 0.0
+        while True:
+            task_id = requested_id or _latest_task_id
+            state = store.get(task_id) if task_id else None
+            # Results (the extracted lyrics) are only handed out by /api/progress
+            state = dict(state or new_progress(), result=None)
+            if requested_id:
+                state['task_id'] = task_id
+
+            if state != last_state:
+                yield f"data: {app.json.dumps(state)}\n\n"
+                last_state = state
+                idle = quiet = 0.0
+                if requested_id and state['status'] in ('complete', 'error'):
+                    return
+            elif not requested_id and quiet >= STREAM_MONITOR_IDLE_SECONDS:
+                # Free the server thread; the browser reconnects later
+                yield f"retry: {STREAM_MONITOR_RETRY_SECONDS * 1000}\n\n"
+                return
+            elif idle >= STREAM_KEEPALIVE_SECONDS:
+                # Comment line; also how a closed connection gets noticed
+                yield ": keep-alive\n\n"
+                idle = 0.0
+
+            with _progress_changed:
+                _progress_changed.wait(timeout=STREAM_RECHECK_SECONDS)
+            idle += STREAM_RECHECK_SECONDS
+            quiet += STREAM_RECHECK_SECONDS
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'Vary': 'Origin'
+    }
+    origin = request.headers.get('Origin')
+    if origin in PROGRESS_MONITOR_ORIGINS:
+        headers['Access-Control-Allow-Origin'] = origin
+
+    return Response(event_stream(), mimetype='text/event-stream', headers=headers)
 
 
 @app.route('/api/download', methods=['POST'])
 def download():
     """Step 1: Download from YouTube"""
+    session = current_session()
     try:
         data = request.json
         youtube_url = data.get('url')
@@ -86,35 +355,25 @@ def download():
         if not youtube_url:
             return jsonify({'error': 'No URL provided'}), 400
 
-        def download_task():
-            try:
-                update_progress('download', 'running', 0, 'Downloading from YouTube...')
-
-                downloader = YouTubeDownloader(TEMP_DIR)
-                result = downloader.download(youtube_url)
-
-                session['youtube_url'] = youtube_url
-                session['audio_path'] = result['audio_path']
-                session['title'] = result['title']
-
-                update_progress(
-                    'download',
-                    'complete',
-                    100,
-                    f"Downloaded: {result['title']}",
-                    result={'title': result['title']}
-                )
-
-            except Exception as e:
-                logger.error(f"Download error: {e}")
-                update_progress('download', 'error', 0, str(e), error=str(e))
+        def on_complete(store, task_id, result):
+            session['youtube_url'] = youtube_url
+            session['audio_path'] = result['audio_path']
+            session['title'] = result['title']
+
+            update_progress(
+                store,
+                task_id,
+                'download',
+                'complete',
+                100,
+                f"Downloaded: {result['title']}",
+                result={'title': result['title']}
+            )
 
         # Start download in background
-        thread = threading.Thread(target=download_task)
-        thread.daemon = True
-        thread.start()
+        task_id = start_task(session, 'download', _download_worker, (youtube_url,), on_complete)
 
-        return jsonify({'success': True, 'message': 'Download started'})
+        return jsonify({'success': True, 'message': 'Download started', 'task_id': task_id})
 
     except Exception as e:
         logger.error(f"Download error: {e}")
@@ -124,31 +383,20 @@ def download():
 @app.route('/api/separate', methods=['POST'])
 def separate():
     """Step 2: Separate vocals"""
+    session = current_session()
     try:
         if not session['audio_path']:
             return jsonify({'error': 'No audio loaded'}), 400
 
-        def separate_task():
-            try:
-                update_progress('separate', 'running', 0, 'Separating vocals (2-3 minutes)...')
-
-                separator = VocalSeparator(TEMP_DIR)
-                result = separator.separate(session['audio_path'])
-
-                session['instrumental_path'] = result['instrumental']
-
-                update_progress('separate', 'complete', 100, 'Vocals separated successfully')
+        def on_complete(store, task_id, result):
+            session['instrumental_path'] = result['instrumental']
 
-            except Exception as e:
-                logger.error(f"Separation error: {e}")
-                update_progress('separate', 'error', 0, str(e), error=str(e))
+            update_progress(store, task_id, 'separate', 'complete', 100, 'Vocals separated successfully')
 
         # Start separation in background
-        thread = threading.Thread(target=separate_task)
-        thread.daemon = True
-        thread.start()
+        task_id = start_task(session, 'separate', _separate_worker, (session['audio_path'],), on_complete)
 
-        return jsonify({'success': True, 'message': 'Separation started'})
+        return jsonify({'success': True, 'message': 'Separation started', 'task_id': task_id})
 
     except Exception as e:
         logger.error(f"Separation error: {e}")
@@ -158,48 +406,28 @@ def separate():
 @app.route('/api/extract-lyrics', methods=['POST'])
 def extract_lyrics():
     """Step 3: Auto-extract lyrics (optional)"""
+    session = current_session()
     try:
         if not session['audio_path']:
             return jsonify({'error': 'No audio loaded'}), 400
 
-        def extract_task():
-            try:
-                update_progress('extract', 'running', 0, 'Extracting lyrics...')
-
-                extractor = LyricsExtractor()
-                result = extractor.extract(session['audio_path'])
-
-                lyrics = []
-                for segment in result['segments']:
-                    lyrics.append({
-                        'start': segment['start'],
-                        'end': segment['end'],
-                        'text': segment['text']
-                    })
-
-                session['auto_lyrics'] = lyrics
-
-                update_progress(
-                    'extract',
-                    'complete',
-                    100,
-                    f"Extracted {len(lyrics)} lyric lines",
-                    result={
-                        'lyrics': lyrics,
-                        'language': result.get('language', 'unknown')
-                    }
-                )
-
-            except Exception as e:
-                logger.error(f"Extraction error: {e}")
-                update_progress('extract', 'error', 0, str(e), error=str(e))
+        def on_complete(store, task_id, result):
+            session['auto_lyrics'] = result['lyrics']
+
+            update_progress(
+                store,
+                task_id,
+                'extract',
+                'complete',
+                100,
+                f"Extracted {len(result['lyrics'])} lyric lines",
+                result=result
+            )
 
         # Start extraction in background
-        thread = threading.Thread(target=extract_task)
-        thread.daemon = True
-        thread.start()
+        task_id = start_task(session, 'extract', _extract_worker, (session['audio_path'],), on_complete)
 
-        return jsonify({'success': True, 'message': 'Extraction started'})
+        return jsonify({'success': True, 'message': 'Extraction started', 'task_id': task_id})
 
     except Exception as e:
         logger.error(f"Extraction error: {e}")
@@ -213,12 +441,12 @@ def serve_audio(filename):
         # Serve from temp directory
         file_path = TEMP_DIR / filename
         if file_path.exists():
-            return send_file(str(file_path))
+            return send_file(str(file_path), conditional=True, etag=True, max_age=3600)
 
         # Or from full path
         file_path = Path(filename)
         if file_path.exists():
-            return send_file(str(file_path))
+            return send_file(str(file_path), conditional=True, etag=True, max_age=3600)
 
         return jsonify({'error': 'File not found'}), 404
     except Exception as e:
@@ -229,6 +457,7 @@ def serve_audio(filename):
 @app.route('/api/save-lyrics', methods=['POST'])
 def save_lyrics():
     """Step 4: Save finalized lyrics"""
+    session = current_session()
     try:
         data = request.json
         lyrics = data.get('lyrics', [])
@@ -245,6 +474,7 @@ def save_lyrics():
 @app.route('/api/generate', methods=['POST'])
 def generate():
     """Step 5: Generate karaoke video"""
+    session = current_session()
     try:
         if not session['instrumental_path']:
             return jsonify({'error': 'No instrumental track'}), 400
@@ -252,56 +482,29 @@ def generate():
         if not session['final_lyrics']:
             return jsonify({'error': 'No lyrics saved'}), 400
 
-        def generate_task():
-            try:
-                update_progress('generate', 'running', 0, 'Preparing video generation...')
-
-                # Convert lyrics to expected format
-                lyrics_data = {
-                    'segments': session['final_lyrics']
-                }
-
-                # Create output path
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                safe_title = "".join(c for c in session['title'] if c.isalnum() or c in (' ', '-', '_')).strip()
-                output_filename = f"{safe_title}_{timestamp}_karaoke.mp4"
-                output_path = OUTPUT_DIR / output_filename
-
-                update_progress('generate', 'running', 10, 'Creating lyric segments...')
-
-                generator = KaraokeVideoGenerator()
-
-                # Note: We can't easily get progress from video_generator
-                # So we'll just update at major milestones
-                update_progress('generate', 'running', 30, 'Generating lyric frames...')
-
-                generator.generate(
-                    audio_path=session['instrumental_path'],
-                    lyrics_data=lyrics_data,
-                    output_path=str(output_path),
-                    title=session['title']
-                )
-
-                session['video_path'] = str(output_path)
-
-                update_progress(
-                    'generate',
-                    'complete',
-                    100,
-                    'Karaoke video generated successfully!',
-                    result={'output_path': str(output_path)}
-                )
+        def on_complete(store, task_id, output_path):
+            session['video_path'] = output_path
 
-            except Exception as e:
-                logger.error(f"Generation error: {e}")
-                update_progress('generate', 'error', 0, str(e), error=str(e))
+            update_progress(
+                store,
+                task_id,
+                'generate',
+                'complete',
+                100,
+                'Karaoke video generated successfully!',
+                result={'output_path': output_path}
+            )
 
         # Start generation in background
-        thread = threading.Thread(target=generate_task)
-        thread.daemon = True
-        thread.start()
+        task_id = start_task(
+            session,
+            'generate',
+            _generate_worker,
+            (session['instrumental_path'], session['final_lyrics'], session['title']),
+            on_complete
+        )
 
-        return jsonify({'success': True, 'message': 'Video generation started'})
+        return jsonify({'success': True, 'message': 'Video generation started', 'task_id': task_id})
 
     except Exception as e:
         logger.error(f"Generation error: {e}")
@@ -311,6 +514,7 @@ def generate():
 @app.route('/api/status')
 def status():
     """Get current session status"""
+    session = current_session()
     return jsonify({
         'title': session.get('title'),
         'has_audio': session.get('audio_path') is not None,
@@ -335,4 +539,7 @@ if __name__ == '__main__':
     print("\nPress Ctrl+C to stop the server")
     print("="*70 + "\n")
 
-    app.run(debug=True, port=5001, threaded=True)
+    # Waitress serves range requests and concurrent audio streams without
+    # blocking the long-running API calls
+    from waitress import serve
+    serve(app, host=os.getenv('HOST', '127.0.0.1'), port=5001, threads=8)
@@ -0,0 +1,69 @@
+"""
+Shared audio decoding for Karaoke Maker
+Decodes a song once and hands the same buffer to Demucs and Whisper
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Demucs models run at 44.1kHz stereo, Whisper expects 16kHz mono
+DEMUCS_SAMPLE_RATE = 44100
+WHISPER_SAMPLE_RATE = 16000
+
+# Only the most recent decode is kept (a 4-minute song is ~85 MB at 44.1kHz
+# stereo float32), which covers the separate-then-transcribe sequence
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_audio(path: Union[str, Path], samplerate: int = DEMUCS_SAMPLE_RATE, channels: int = 2):
+    """
+    Decode an audio file to a float32 tensor, reusing the previous decode of the same file
+
+    Args:
+        path: Path to the audio file
+        samplerate: Target sample rate
+        channels: Target channel count
+
+    Returns:
+        Tensor of shape (channels, samples)
+    """
+    from demucs.audio import AudioFile
+
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size, samplerate, channels)
+
+    with _cache_lock:
+        wav = _cache.get(key)
+        if wav is None:
+            logger.info(f"Decoding audio: {path.name}")
+            wav = AudioFile(path).read(streams=0, samplerate=samplerate, channels=channels)
+            _cache.clear()
+            _cache[key] = wav
+
+    return wav
+
+
+def to_whisper_audio(wav, samplerate: int = DEMUCS_SAMPLE_RATE) -> np.ndarray:
+    """
+    Downmix and resample a decoded buffer to the 16kHz mono input Whisper expects
+
+    Args:
+        wav: Tensor of shape (channels, samples)
+        samplerate: Sample rate of wav
+
+    Returns:
+        float32 array of 16kHz mono samples
+    """
+    import torchaudio.functional as F
+
+    mono = wav.mean(0)
+    if samplerate != WHISPER_SAMPLE_RATE:
+        mono = F.resample(mono, samplerate, WHISPER_SAMPLE_RATE)
+    return mono.numpy().astype(np.float32, copy=False)
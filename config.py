@@ -37,8 +37,16 @@ LINE_SPACING = 60
 
 # Demucs settings
 DEMUCS_MODEL = 'htdemucs'  # High-quality model
-DEMUCS_DEVICE = 'cpu'  # Change to 'cuda' if you have GPU
+DEMUCS_DEVICE = os.getenv('DEMUCS_DEVICE', 'auto')  # 'auto' uses CUDA, then Apple MPS, when available, or force 'cpu'/'cuda'/'mps'
+DEMUCS_SEGMENT = 7.8  # Seconds per inference chunk (keeps GPU memory bounded)
+DEMUCS_QUANTIZE = os.getenv('DEMUCS_QUANTIZE', '0') == '1'  # int8 dynamic quantization on CPU (faster, slightly lower quality)
 
 # Whisper settings
-WHISPER_MODEL = 'small'  # Options: tiny, base, small, medium, large (small+ recommended for Bengali/Hindi)
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'auto')  # 'auto' = base for English, small otherwise (medium for CJK); or force tiny/base/small/medium/large
 WHISPER_LANGUAGE = None  # Auto-detect, or specify like 'bn' (Bengali), 'hi' (Hindi), 'en' (English)
+WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'auto')  # 'auto' uses CUDA when available, or force 'cpu'/'cuda'
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'auto')  # 'auto' = float16 on GPU, int8 on CPU
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '4'))  # Speech chunks decoded at once for songs over a minute (1 = sequential)
+
+# Pipeline settings
+KARAOKE_WORKERS = int(os.getenv('KARAOKE_WORKERS', '2'))  # Background threads shared by the pipeline steps (separation, transcription, warm-up)
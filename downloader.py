@@ -1,16 +1,123 @@
 """
 YouTube audio downloader module
-Downloads audio from YouTube videos using pytubefix
+Downloads audio from YouTube videos using pytubefix, falling back to yt-dlp
 """
+import io
 import logging
-import subprocess
+import shutil
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from pytubefix import YouTube
-from typing import Dict, Optional
+import av
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from utils import safe_filename
+
+try:
+    import yt_dlp
+    YTDLP_AVAILABLE = True
+except ImportError:
+    YTDLP_AVAILABLE = False
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Parallel connections / fragments for yt-dlp downloads
+YTDLP_CONCURRENCY = 8
+
+# Parallel ranged requests per pytubefix download, and the largest range
+# asked for at once (YouTube throttles requests for more than ~10 MB)
+PYTUBEFIX_CONNECTIONS = 4
+PYTUBEFIX_RANGE_SIZE = 9 * 1024 * 1024
+
+# Headers pytubefix sends with its own media requests
+_MEDIA_HEADERS = {'User-Agent': 'Mozilla/5.0', 'accept-language': 'en-US,en'}
+
+# LAME VBR quality (ffmpeg's -q:a): 0 = best, 9 = smallest; 2 averages ~190 kbps
+MP3_VBR_QUALITY = 2
+
+
+def transcode_to_mp3(source: Union[str, Path, BinaryIO], mp3_path: Path):
+    """
+    Transcode audio to VBR MP3 in-process with PyAV
+
+    Args:
+        source: Path to the downloaded audio (.webm, .m4a, ...) or a
+                seekable file object holding it
+        mp3_path: Path to write the MP3 to
+    """
+    if isinstance(source, Path):
+        source = str(source)
+
+    with av.open(source) as container:
+        if not container.streams.audio:
+            raise ValueError(f"No audio stream to convert for {mp3_path.name}")
+        in_stream = container.streams.audio[0]
+
+        with av.open(str(mp3_path), 'w') as output:
+            out_stream = output.add_stream('libmp3lame', rate=in_stream.rate, options={
+                'flags': '+qscale',
+                # global_quality is in lambda units (FF_QP2LAMBDA = 118)
+                'global_quality': str(MP3_VBR_QUALITY * 118),
+            })
+            out_stream.layout = 'stereo' if in_stream.channels >= 2 else 'mono'
+
+            # The encoder resamples to its own sample format and frame size
+            for frame in container.decode(in_stream):
+                for packet in out_stream.encode(frame):
+                    output.mux(packet)
+            for packet in out_stream.encode(None):
+                output.mux(packet)
+
+
+def fetch_stream(audio_stream, connections: int = PYTUBEFIX_CONNECTIONS) -> bytearray:
+    """
+    Download a pytubefix stream into memory over several ranged requests
+
+    A single request is paced by YouTube's CDN well below a fast link's
+    bandwidth; a few concurrent byte ranges fill it.
+
+    Args:
+        audio_stream: pytubefix Stream to download
+        connections: Maximum simultaneous requests
+
+    Returns:
+        The stream's bytes
+    """
+    size = audio_stream.filesize
+    if not size:
+        raise ValueError(f"Unknown size for stream {audio_stream}")
+    data = bytearray(size)
+    range_size = max(1, min(PYTUBEFIX_RANGE_SIZE, -(-size // connections)))
+
+    def fetch_range(start: int):
+        stop = min(start + range_size, size)
+        request = urllib.request.Request(f"{audio_stream.url}&range={start}-{stop - 1}", headers=_MEDIA_HEADERS)
+        view = memoryview(data)[start:stop]
+        with urllib.request.urlopen(request, timeout=30) as response:
+            received = 0
+            while received < len(view):
+                count = response.readinto(view[received:])
+                if not count:
+                    raise IOError(f"Connection closed {stop - start - received} bytes short of range {start}-{stop - 1}")
+                received += count
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        # list() re-raises the first failed range
+        list(pool.map(fetch_range, range(0, size, range_size)))
+
+    return data
+
+
+@lru_cache(maxsize=64)
+def _probe(url: str) -> YouTube:
+    """Fetch video metadata and the stream list once per URL"""
+    yt = YouTube(url)
+    yt.streams  # Loads (and caches on the object) the stream manifest
+    return yt
+
 
 class YouTubeDownloader:
     """Downloads audio from YouTube videos"""
@@ -19,27 +126,128 @@ class YouTubeDownloader:
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def download(self, url: str, output_filename: Optional[str] = None) -> Dict[str, str]:
+        # One yt-dlp instance is kept per downloader so its HTTP connections,
+        # cookies and player cache stay warm between videos
+        self._ydl = None
+        self._ydl_lock = threading.Lock()
+
+    def download(
+        self,
+        url: str,
+        output_filename: Optional[str] = None,
+        convert_to_mp3: bool = False
+    ) -> Dict[str, str]:
         """
         Download audio from YouTube URL
 
         Args:
             url: YouTube video URL
             output_filename: Optional custom filename (without extension)
+            convert_to_mp3: Transcode to MP3. By default the stream's own
+                            container (.m4a/.webm) is kept, since Demucs and
+                            Whisper decode it directly.
 
         Returns:
             Dictionary with paths to downloaded files and metadata
         """
         try:
-            logger.info(f"Downloading audio from: {url}")
+            result = self._download_pytubefix(url, output_filename, convert_to_mp3)
+        except Exception as e:
+            if not YTDLP_AVAILABLE:
+                raise
+            logger.warning("pytubefix failed (%s), retrying with yt-dlp", e)
+            result = self._download_ytdlp(url, output_filename)
+
+        if convert_to_mp3 and not result['audio_path'].endswith('.mp3'):
+            result['audio_path'] = str(self._to_mp3(Path(result['audio_path'])))
+
+        logger.info("Saved to: %s", result['audio_path'])
+        return result
+
+    def _to_mp3(self, audio_path: Path) -> Path:
+        """Transcode a download to MP3, keeping the original if that fails"""
+        mp3_path = audio_path.with_suffix('.mp3')
+        if mp3_path == audio_path:
+            return audio_path
+
+        try:
+            logger.info("Converting to MP3: %s", mp3_path)
+            transcode_to_mp3(audio_path, mp3_path)
+        except (av.error.FFmpegError, ValueError) as e:
+            logger.warning("Could not convert to MP3, keeping %s: %s", audio_path.suffix, e)
+            mp3_path.unlink(missing_ok=True)
+            return audio_path
+
+        audio_path.unlink(missing_ok=True)
+        return mp3_path
+
+    def _ytdlp_options(self) -> Dict:
+        """Build yt-dlp options for a fast, audio-only download"""
+        options = {
+            'format': 'bestaudio/best',
+            'outtmpl': str(self.output_dir / '%(title)s.%(ext)s'),
+            'noplaylist': True,
+            'lazy_playlist': True,
+            'quiet': True,
+            'no_warnings': True,
+            # Fetch fragmented (DASH/HLS) streams in parallel
+            'concurrent_fragment_downloads': YTDLP_CONCURRENCY,
+            # Skip the extra player config requests
+            'extractor_args': {'youtube': {'player_skip': ['webpage', 'configs']}},
+        }
+
+        # Multi-connection downloads when aria2c is installed
+        if shutil.which('aria2c'):
+            options['external_downloader'] = {'default': 'aria2c'}
+            options['external_downloader_args'] = {
+                'aria2c': ['-x', str(YTDLP_CONCURRENCY), '-s', str(YTDLP_CONCURRENCY), '-k', '1M']
+            }
+
+        return options
+
+    def _download_ytdlp(self, url: str, output_filename: Optional[str] = None) -> Dict[str, str]:
+        """Download the best audio stream with yt-dlp"""
+        logger.info("Downloading audio with yt-dlp from: %s", url)
+
+        # YoutubeDL isn't thread-safe, so downloads through the shared instance run one at a time
+        with self._ydl_lock:
+            if self._ydl is None:
+                self._ydl = yt_dlp.YoutubeDL(self._ytdlp_options())
+
+            template = f"{output_filename}.%(ext)s" if output_filename else '%(title)s.%(ext)s'
+            self._ydl.params['outtmpl']['default'] = str(self.output_dir / template)
+            info = self._ydl.extract_info(url, download=True)
+
+        audio_path = Path(info['requested_downloads'][0]['filepath'])
+
+        result = {
+            'audio_path': str(audio_path),
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'artist': info.get('uploader'),
+        }
+
+        logger.info("Downloaded: %s", result['title'])
+
+        return result
+
+    def _download_pytubefix(
+        self,
+        url: str,
+        output_filename: Optional[str] = None,
+        convert_to_mp3: bool = False
+    ) -> Dict[str, str]:
+        """Download the best audio stream with pytubefix"""
+        try:
+            logger.info("Downloading audio from: %s", url)
             
-            # Create YouTube object
-            yt = YouTube(url)
+            # Metadata is cached per URL, so retries skip the round trips
+            yt = _probe(url)
             title = yt.title
             duration = yt.length
             author = yt.author
             
-            logger.info(f"Found video: {title}")
+            logger.info("Found video: %s", title)
             
             # Get highest quality audio stream
             audio_stream = yt.streams.filter(only_audio=True).order_by('abr').last()
@@ -53,39 +261,35 @@ class YouTubeDownloader:
             
             # Create safe filename
             if output_filename:
-                safe_filename = output_filename
+                file_stem = output_filename
             else:
-                safe_filename = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
+                file_stem = safe_filename(title)
             
+            # A finished download is only ever written under its final name
+            native_path = self.output_dir / f"{file_stem}.{audio_stream.subtype}"
+            mp3_path = self.output_dir / f"{file_stem}.mp3"
+            for existing_path in ((mp3_path, native_path) if convert_to_mp3 else (native_path,)):
+                if existing_path.exists():
+                    logger.info("Already downloaded: %s", existing_path)
+                    return {
+                        'audio_path': str(existing_path),
+                        'title': title,
+                        'duration': duration,
+                        'artist': author,
+                    }
+
             # Download the audio (will be .mp4 or .webm)
-            logger.info(f"Downloading audio stream: {audio_stream}")
-            downloaded_path = audio_stream.download(
-                output_path=str(self.output_dir),
-                filename=f"{safe_filename}_temp"
-            )
-            
-            # Try to convert to MP3 using ffmpeg (optional)
-            mp3_path = self.output_dir / f"{safe_filename}.mp3"
-            try:
-                logger.info(f"Converting to MP3: {mp3_path}")
-                subprocess.run([
-                    '/opt/homebrew/bin/ffmpeg', '-y', '-i', downloaded_path,
-                    '-vn', '-acodec', 'libmp3lame', '-ab', '320k',
-                    str(mp3_path)
-                ], check=True, capture_output=True)
-                
-                # Remove temp file
-                Path(downloaded_path).unlink(missing_ok=True)
-                audio_path = mp3_path
-            except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                # ffmpeg not available or failed - keep original format
-                logger.warning(f"Could not convert to MP3 (ffmpeg issue): {e}")
-                # Rename temp file to final name with proper extension
-                ext = Path(downloaded_path).suffix or '.webm'
-                final_path = self.output_dir / f"{safe_filename}{ext}"
-                Path(downloaded_path).rename(final_path)
-                audio_path = final_path
-                logger.info(f"Using original format: {audio_path}")
+            logger.info("Downloading audio stream: %s", audio_stream)
+            data = fetch_stream(audio_stream)
+
+            if convert_to_mp3:
+                audio_path = self._encode_mp3(data, mp3_path, native_path)
+            else:
+                # Written under a temporary name, then moved to the final one
+                partial_path = self.output_dir / f"{file_stem}_temp.{audio_stream.subtype}"
+                partial_path.write_bytes(data)
+                audio_path = native_path
+                partial_path.replace(audio_path)
             
             result = {
                 'audio_path': str(audio_path),
@@ -94,15 +298,40 @@ class YouTubeDownloader:
                 'artist': author,
             }
 
-            logger.info(f"Downloaded: {result['title']}")
-            logger.info(f"Saved to: {audio_path}")
+            logger.info("Downloaded: %s", result['title'])
 
             return result
 
         except Exception as e:
-            logger.error(f"Error downloading from YouTube: {e}")
+            logger.error("Error downloading from YouTube: %s", e)
+            # Stream URLs expire, so don't reuse a probe that may be stale
+            _probe.cache_clear()
             raise
 
+    def _encode_mp3(self, data: bytearray, mp3_path: Path, native_path: Path) -> Path:
+        """
+        Encode a downloaded stream to MP3 straight from memory
+
+        The compressed stream is only a few MB, so encoding from memory
+        skips writing it to disk and reading it back. It's buffered rather
+        than piped because m4a files may keep their index at the end, which
+        the decoder has to seek to.
+        """
+        logger.info("Converting to MP3: %s", mp3_path)
+        buffer = io.BytesIO(data)
+
+        partial_path = mp3_path.with_name(f"{mp3_path.stem}_temp.mp3")
+        try:
+            transcode_to_mp3(buffer, partial_path)
+        except (av.error.FFmpegError, ValueError) as e:
+            logger.warning("Could not convert to MP3, keeping %s: %s", native_path.suffix, e)
+            partial_path.unlink(missing_ok=True)
+            native_path.write_bytes(data)
+            return native_path
+
+        partial_path.replace(mp3_path)
+        return mp3_path
+
 
 def download_audio(url: str, output_dir: Path) -> Dict[str, str]:
     """
@@ -119,12 +348,46 @@ def download_audio(url: str, output_dir: Path) -> Dict[str, str]:
     return downloader.download(url)
 
 
+def download_many(urls: List[str], output_dir: Path, max_concurrency: int = 4) -> List[Dict[str, str]]:
+    """
+    Download audio for several YouTube URLs in parallel
+
+    Downloads are network-bound, so a few at once use bandwidth a single
+    stream leaves idle. On a slow link they just split the same bandwidth;
+    use max_concurrency=1 there. yt-dlp fallbacks share one instance and
+    run one at a time.
+
+    Args:
+        urls: YouTube video URLs
+        output_dir: Directory to save audio files
+        max_concurrency: Maximum simultaneous downloads
+
+    Returns:
+        One dictionary per URL, in order: the download results, or
+        {'url', 'error'} if that download failed
+    """
+    downloader = YouTubeDownloader(output_dir)
+
+    def download_one(url: str) -> Dict[str, str]:
+        try:
+            return dict(downloader.download(url), url=url)
+        except Exception as e:
+            return {'url': url, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        return list(pool.map(download_one, urls))
+
+
 if __name__ == '__main__':
     # Test the downloader
+    logging.basicConfig(level=logging.INFO)
     import sys
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2:
+        for result in download_many(sys.argv[1:], Path('/tmp/karaoke-test')):
+            print(f"Downloaded: {result}")
+    elif len(sys.argv) > 1:
         test_url = sys.argv[1]
         result = download_audio(test_url, Path('/tmp/karaoke-test'))
         print(f"Downloaded: {result}")
     else:
-        print("Usage: python downloader.py <youtube_url>")
+        print("Usage: python downloader.py <youtube_url> [<youtube_url> ...]")
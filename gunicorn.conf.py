@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for Karaoke Maker
+
+Usage:
+    gunicorn              # serves app:app
+    gunicorn app_with_progress:app
+"""
+import os
+import sys
+
+wsgi_app = 'app:app'
+bind = f"{os.getenv('HOST', '127.0.0.1')}:5001"
+
+# One process holds the models; threads keep audio streaming and the API
+# responsive while a long step runs
+workers = 1
+threads = 8
+
+# Separation and video generation can take several minutes per request
+timeout = 600
+
+# Import the app (and torch, demucs, faster-whisper) once in the master
+preload_app = True
+
+
+def post_worker_init(worker):
+    """Load the models when the worker starts instead of on the first request"""
+    # Loaded after the fork: CUDA contexts and OpenMP thread pools don't
+    # survive fork(), so the weights can't be shared from the master.
+    # app_with_progress runs the models in its own worker processes instead.
+    module = sys.modules[worker.wsgi.import_name]
+    pipeline = sys.modules.get('pipeline')
+    if pipeline is not None and not hasattr(module, 'get_pool'):
+        pipeline.get_separator()._load_model()
+        pipeline.get_extractor()
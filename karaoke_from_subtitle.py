@@ -3,80 +3,37 @@
 Create karaoke video from subtitle file
 Usage: python karaoke_from_subtitle.py <audio_file> <subtitle_file>
 """
+import logging
 import sys
 from pathlib import Path
-from downloader import YouTubeDownloader
-from separator import VocalSeparator
-from video_generator import KaraokeVideoGenerator
-from subtitle_importer import import_subtitles
+from karaoke_maker import LOG_FORMAT, KaraokeMaker
+from lyrics_sources import SubtitleSource
 
 TEMP_DIR = Path('/tmp/karaoke-temp')
 OUTPUT_DIR = Path.home() / 'Downloads'
 
 
-def create_karaoke(audio_source: str, subtitle_file: str):
+def create_karaoke(audio_source: str, subtitle_file: str) -> str:
     """
     Create karaoke video from audio source and subtitle file
 
     Args:
         audio_source: Path to audio file OR YouTube URL
         subtitle_file: Path to .srt or .ass subtitle file
-    """
-    TEMP_DIR.mkdir(parents=True, exist_ok=True)
-
-    # Determine if audio_source is YouTube URL or local file
-    if audio_source.startswith('http://') or audio_source.startswith('https://'):
-        # Download from YouTube
-        print(f"\n[1/4] Downloading from YouTube...")
-        downloader = YouTubeDownloader(TEMP_DIR)
-        result = downloader.download(audio_source)
-        audio_path = result['audio_path']
-        title = result['title']
-        print(f"✓ Downloaded: {title}")
-    else:
-        # Use local audio file
-        audio_path = audio_source
-        title = Path(audio_source).stem
-        print(f"\n[1/4] Using audio file: {title}")
-
-    # Separate vocals
-    print(f"\n[2/4] Separating vocals (2-3 minutes)...")
-    separator = VocalSeparator(TEMP_DIR)
-    separated = separator.separate(audio_path)
-    instrumental_path = separated['instrumental']
-    print(f"✓ Instrumental track created")
-
-    # Import lyrics from subtitle file
-    print(f"\n[3/4] Importing lyrics from subtitle file...")
-    lyrics_data = import_subtitles(subtitle_file)
-    print(f"✓ Imported {len(lyrics_data['segments'])} lyric lines")
 
-    # Generate karaoke video
-    print(f"\n[4/4] Generating karaoke video (3-5 minutes)...")
-    generator = KaraokeVideoGenerator()
-
-    # Create output path
-    from datetime import datetime
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
-    output_filename = f"{safe_title}_{timestamp}_karaoke.mp4"
-    output_path = OUTPUT_DIR / output_filename
-
-    generator.generate(
-        audio_path=instrumental_path,
-        lyrics_data=lyrics_data,
-        output_path=str(output_path),
-        title=title
-    )
+    Returns:
+        Path to generated karaoke video
+    """
+    # Parsing the subtitles first means a bad file fails before minutes of separation
+    lyrics_source = SubtitleSource(subtitle_file)
 
-    print("\n" + "="*70)
-    print("✓ SUCCESS! KARAOKE VIDEO READY")
-    print("="*70)
-    print(f"\nOutput: {output_path}")
-    print("="*70 + "\n")
+    maker = KaraokeMaker(output_dir=OUTPUT_DIR, temp_dir=TEMP_DIR)
+    return maker.create(audio_source, lyrics_source=lyrics_source)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
     if len(sys.argv) < 3:
         print("\nKARAOKE MAKER - FROM SUBTITLE FILE")
         print("="*70)
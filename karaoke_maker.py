@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Karaoke Maker
-Creates karaoke videos from YouTube URLs
+Creates karaoke videos from YouTube URLs or local audio files
 
 Usage:
     python karaoke_maker.py <youtube_url>
@@ -9,34 +9,74 @@ Usage:
 """
 import argparse
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 import sys
 import shutil
-from datetime import datetime
+from typing import Optional
 
-from downloader import YouTubeDownloader
-from separator import VocalSeparator
-from lyrics_extractor import LyricsExtractor
-from video_generator import KaraokeVideoGenerator
+from lyrics_sources import LyricsSource, WhisperSource
 import config
+from utils import karaoke_filename, limit_cpu_threads
+
+# Applied by the CLI entry points; library modules only create loggers
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def get_separator(output_dir: Path):
+    """
+    Shared VocalSeparator (configured from config.py) for an output directory
+
+    KaraokeMaker instances in the same process reuse it, so Demucs is only
+    loaded for the first song of a batch.
+    """
+    from separator import VocalSeparator
+    return VocalSeparator(
+        output_dir,
+        model=config.DEMUCS_MODEL,
+        device=config.DEMUCS_DEVICE,
+        segment=config.DEMUCS_SEGMENT,
+        quantize=config.DEMUCS_QUANTIZE
+    )
+
+
+@lru_cache(maxsize=1)
+def get_lyrics_extractor(cache_dir: Path):
+    """
+    Shared LyricsExtractor (configured from config.py) caching into cache_dir
+
+    Created on first use, so runs that bring their own lyrics never load
+    Whisper; after that every KaraokeMaker reuses the loaded model.
+    """
+    from lyrics_extractor import LyricsExtractor
+    return LyricsExtractor(
+        model_size=config.WHISPER_MODEL,
+        language=config.WHISPER_LANGUAGE,
+        device=config.WHISPER_DEVICE,
+        compute_type=config.WHISPER_COMPUTE_TYPE,
+        cache_dir=cache_dir,
+        batch_size=config.WHISPER_BATCH_SIZE
+    )
+
+
 class KaraokeMaker:
     """Main class for creating karaoke videos"""
 
-    def __init__(self, output_dir: Path = None, temp_dir: Path = None):
+    def __init__(self, output_dir: Path = None, temp_dir: Path = None, fast: Optional[bool] = None):
         """
         Initialize Karaoke Maker
 
         Args:
             output_dir: Directory for final karaoke videos
             temp_dir: Directory for temporary files
+            fast: Render the lyrics with ffmpeg's subtitle filter instead of
+                  drawing frames in Python (defaults to the KARAOKE_FAST env
+                  setting)
         """
         self.output_dir = output_dir or config.OUTPUT_DIR
         self.temp_dir = temp_dir or config.TEMP_DIR
@@ -45,81 +85,99 @@ class KaraokeMaker:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.temp_dir.mkdir(parents=True, exist_ok=True)
 
+        # Separation and transcription run side by side, so each model's
+        # thread pool gets half the cores (set before the models load)
+        limit_cpu_threads(max(1, (os.cpu_count() or 2) // 2))
+
+        # The pipeline modules pull in torch, Whisper, PyAV and PIL, so they're
+        # imported here rather than at the top: --help and argument errors
+        # return without paying for them
+        from downloader import YouTubeDownloader
+        from video_generator import KaraokeVideoGenerator
+
         # Initialize components
         self.downloader = YouTubeDownloader(self.temp_dir)
-        self.separator = VocalSeparator(
-            self.temp_dir,
-            model=config.DEMUCS_MODEL,
-            device=config.DEMUCS_DEVICE
-        )
-        self.lyrics_extractor = LyricsExtractor(
-            model_size=config.WHISPER_MODEL,
-            language=config.WHISPER_LANGUAGE
-        )
+        self.separator = get_separator(self.temp_dir)
         self.video_generator = KaraokeVideoGenerator(
             width=config.VIDEO_WIDTH,
             height=config.VIDEO_HEIGHT,
             fps=config.VIDEO_FPS,
             font_size=config.FONT_SIZE,
             font_color=config.FONT_COLOR,
-            highlight_color=config.HIGHLIGHT_COLOR
+            highlight_color=config.HIGHLIGHT_COLOR,
+            fast=fast
         )
 
-    def create(self, youtube_url: str, custom_output_name: str = None) -> str:
+    @property
+    def lyrics_extractor(self):
+        """Whisper extractor (LyricsExtractor), created on first use"""
+        return get_lyrics_extractor(self.temp_dir / 'whisper_cache')
+
+    def create(
+        self,
+        audio_source: str,
+        custom_output_name: str = None,
+        lyrics_source: Optional[LyricsSource] = None
+    ) -> str:
         """
-        Create karaoke video from YouTube URL
+        Create karaoke video from a YouTube URL or local audio file
+
+        Models stay loaded on the instance, so reuse one KaraokeMaker for
+        several songs.
 
         Args:
-            youtube_url: YouTube video URL
+            audio_source: YouTube video URL or path to an audio file
             custom_output_name: Optional custom output filename
+            lyrics_source: Where the lyrics come from (defaults to
+                           transcribing the audio with Whisper)
 
         Returns:
             Path to generated karaoke video
         """
+        if lyrics_source is None:
+            lyrics_source = WhisperSource(self.lyrics_extractor)
+
         logger.info("=" * 70)
         logger.info("KARAOKE MAKER - Starting process")
         logger.info("=" * 70)
 
         try:
-            # Step 1: Download audio
-            logger.info("\n[1/4] Downloading audio from YouTube...")
-            download_result = self.downloader.download(youtube_url)
-            audio_path = download_result['audio_path']
-            title = download_result['title']
-            logger.info(f"✓ Downloaded: {title}")
-
-            # Step 2: Separate vocals
+            # Step 1: Get the audio
+            if audio_source.startswith(('http://', 'https://')):
+                logger.info("\n[1/4] Downloading audio from YouTube...")
+                download_result = self.downloader.download(audio_source)
+                audio_path = download_result['audio_path']
+                title = download_result['title']
+                logger.info("✓ Downloaded: %s", title)
+            else:
+                audio_path = audio_source
+                if not Path(audio_path).exists():
+                    raise FileNotFoundError(f"Audio file not found: {audio_path}")
+                title = Path(audio_path).stem
+                logger.info("\n[1/4] Using audio file: %s", title)
+
+            # Settle the output path before the slow stages, so a bad name or
+            # an unwritable directory fails now rather than after them
+            output_path = str(self._output_path(title, custom_output_name))
+
+            # Steps 2-3: Separate vocals and load lyrics side by side; both
+            # only need the audio (which is decoded once and shared). Both are
+            # cached by audio content, so re-running after a failed video step
+            # skips them.
             logger.info("\n[2/4] Separating vocals (this takes 2-3 minutes)...")
-            separated = self.separator.separate(audio_path)
-            instrumental_path = separated['instrumental']
-            logger.info(f"✓ Instrumental track created")
-
-            # Step 3: Extract lyrics
-            logger.info("\n[3/4] Extracting lyrics with timestamps...")
-            lyrics_data = self.lyrics_extractor.extract(audio_path)
-            logger.info(f"✓ Extracted {len(lyrics_data['segments'])} lyric segments")
+            logger.info("[3/4] Loading lyrics with timestamps...")
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                separation = pool.submit(self.separator.separate, audio_path)
+                extraction = pool.submit(lyrics_source.load, audio_path)
 
-            # Save lyrics for reference
-            lyrics_json_path = Path(audio_path).parent / f"{Path(audio_path).stem}_lyrics.json"
-            self.lyrics_extractor.save_lyrics(lyrics_data, lyrics_json_path)
+                instrumental_path = separation.result()['instrumental']
+                logger.info("✓ Instrumental track created")
+                lyrics_data = extraction.result()
+                logger.info("✓ Loaded %s lyric segments", len(lyrics_data['segments']))
 
             # Step 4: Generate video
             logger.info("\n[4/4] Generating karaoke video (this takes 3-5 minutes)...")
 
-            # Determine output filename
-            if custom_output_name:
-                output_filename = custom_output_name
-                if not output_filename.endswith('.mp4'):
-                    output_filename += '.mp4'
-            else:
-                # Sanitize title for filename
-                safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_'))
-                safe_title = safe_title.strip()
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_filename = f"{safe_title}_{timestamp}_karaoke.mp4"
-
-            output_path = str(self.output_dir / output_filename)
-
             self.video_generator.generate(
                 instrumental_path,
                 lyrics_data,
@@ -130,38 +188,67 @@ class KaraokeMaker:
             logger.info("\n" + "=" * 70)
             logger.info("✓ KARAOKE VIDEO CREATED SUCCESSFULLY!")
             logger.info("=" * 70)
-            logger.info(f"Output: {output_path}")
-            logger.info(f"Lyrics: {lyrics_json_path}")
+            logger.info("Output: %s", output_path)
             logger.info("=" * 70)
 
-            # Cleanup temp files
+            # Cleanup temp files (only on success; a failed run keeps its
+            # stems and lyrics for the retry)
             self._cleanup_temp_files()
 
             return output_path
 
         except Exception as e:
-            logger.error(f"\n✗ Error creating karaoke video: {e}")
+            logger.error("\n✗ Error creating karaoke video: %s", e)
             raise
 
+    def _output_path(self, title: str, custom_output_name: str = None) -> Path:
+        """
+        Build and check the path the video will be written to
+
+        Args:
+            title: Song title, used for the default timestamped name
+            custom_output_name: Optional custom output filename
+
+        Returns:
+            Path inside the output directory
+        """
+        if custom_output_name:
+            output_filename = custom_output_name
+            if not output_filename.endswith('.mp4'):
+                output_filename += '.mp4'
+            if Path(output_filename).name != output_filename:
+                raise ValueError(f"Output name must be a filename, not a path: {custom_output_name}")
+        else:
+            output_filename = karaoke_filename(title)
+
+        if not os.access(self.output_dir, os.W_OK):
+            raise PermissionError(f"Output directory is not writable: {self.output_dir}")
+
+        return self.output_dir / output_filename
+
     def _cleanup_temp_files(self):
         """Clean up temporary files"""
         try:
             logger.info("\nCleaning up temporary files...")
-            # Keep the temp directory but remove its contents
-            for item in self.temp_dir.iterdir():
-                if item.is_file():
-                    item.unlink()
-                elif item.is_dir():
-                    shutil.rmtree(item)
+            # Keep the temp directory but remove its contents; scandir's
+            # entries carry their type, so nothing is stat'ed twice
+            with os.scandir(self.temp_dir) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
             logger.info("✓ Cleanup complete")
         except Exception as e:
-            logger.warning(f"Could not clean up temp files: {e}")
+            logger.warning("Could not clean up temp files: %s", e)
 
 
 def main():
     """Main CLI entry point"""
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
     parser = argparse.ArgumentParser(
-        description='Create karaoke videos from YouTube URLs',
+        description='Create karaoke videos from YouTube URLs or audio files',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
@@ -173,7 +260,7 @@ Examples:
 
     parser.add_argument(
         'url',
-        help='YouTube video URL'
+        help='YouTube video URL or path to an audio file'
     )
 
     parser.add_argument(
@@ -199,12 +286,21 @@ Examples:
         default=config.TEMP_DIR
     )
 
+    parser.add_argument(
+        '--fast',
+        help='Burn the lyrics in with ffmpeg (libass) in one pass instead of drawing every frame',
+        action='store_const',
+        const=True,
+        default=None
+    )
+
     args = parser.parse_args()
 
     # Create karaoke maker
     maker = KaraokeMaker(
         output_dir=args.output_dir,
-        temp_dir=args.temp_dir
+        temp_dir=args.temp_dir,
+        fast=args.fast
     )
 
     # Create karaoke video
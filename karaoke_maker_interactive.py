@@ -2,18 +2,24 @@
 Interactive Karaoke Maker with Lyrics Editing
 Allows users to review and edit lyrics before video generation
 """
+import argparse
 import os
 import sys
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
-from config import OUTPUT_DIR, TEMP_DIR
+import numpy as np
+
+from config import KARAOKE_WORKERS, OUTPUT_DIR, TEMP_DIR
 from downloader import YouTubeDownloader
 from separator import VocalSeparator
 from lyrics_extractor import LyricsExtractor
 from video_generator import KaraokeVideoGenerator
+from segments import Segment
+from utils import karaoke_filename, limit_cpu_threads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,19 +29,33 @@ class InteractiveKaraokeMaker:
     """Interactive karaoke maker with lyrics editing step"""
 
     def __init__(self):
+        # Separation and transcription run side by side, so each model's
+        # thread pool gets half the cores (set before the models load)
+        limit_cpu_threads(max(1, (os.cpu_count() or 2) // 2))
+
         self.downloader = YouTubeDownloader(TEMP_DIR)
         self.separator = VocalSeparator(TEMP_DIR)
         self.lyrics_extractor = LyricsExtractor()
         self.video_generator = KaraokeVideoGenerator()
 
+        # One pool for every background job in the pipeline; its threads are
+        # started on first use and reused by later steps and songs
+        self._pool = ThreadPoolExecutor(max_workers=max(1, KARAOKE_WORKERS))
+
         # Ensure output directories exist
         OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
         TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
-    def step1_download_and_extract(self, youtube_url: str) -> tuple:
+    def step1_download_and_extract(self, youtube_url: str, skip_separation: bool = False) -> tuple:
         """
         Step 1: Download audio, separate vocals, extract lyrics
 
+        Args:
+            youtube_url: YouTube video URL
+            skip_separation: The audio is already an instrumental (or a backing
+                             track with guide vocals); use it as-is instead of
+                             running Demucs
+
         Returns:
             (audio_path, instrumental_path, lyrics_data, title)
         """
@@ -50,15 +70,27 @@ class InteractiveKaraokeMaker:
         title = download_result['title']
         logger.info(f"✓ Downloaded: {title}")
 
-        # Separate vocals
+        if skip_separation:
+            print("\n[2/3] Skipping vocal separation (using the audio as the instrumental)")
+            print("[3/3] Extracting lyrics with timestamps...")
+            lyrics_data = self.lyrics_extractor.extract(audio_path)
+            logger.info(f"✓ Extracted {len(lyrics_data['segments'])} lyric segments")
+            return audio_path, audio_path, lyrics_data, title
+
+        # Separate vocals and extract lyrics side by side; both only need the
+        # downloaded audio. When both models are on the GPU they take turns,
+        # since two at once can run out of VRAM.
         print("\n[2/3] Separating vocals (this takes 2-3 minutes)...")
-        separated = self.separator.separate(audio_path)
-        instrumental_path = separated['instrumental']
+        print("[3/3] Extracting lyrics with timestamps...")
+        both_on_gpu = self.separator.device == 'cuda' and self.lyrics_extractor.device == 'cuda'
+        separation = self._pool.submit(self.separator.separate, audio_path)
+        if both_on_gpu:
+            separation.result()
+        extraction = self._pool.submit(self.lyrics_extractor.extract, audio_path)
+
+        instrumental_path = separation.result()['instrumental']
         logger.info("✓ Instrumental track created")
-
-        # Extract lyrics
-        print("\n[3/3] Extracting lyrics with timestamps...")
-        lyrics_data = self.lyrics_extractor.extract(audio_path)
+        lyrics_data = extraction.result()
         logger.info(f"✓ Extracted {len(lyrics_data['segments'])} lyric segments")
 
         return audio_path, instrumental_path, lyrics_data, title
@@ -198,22 +230,30 @@ class InteractiveKaraokeMaker:
             print(f"\nWarning: You provided {len(new_lines)} lines, but there are {len(lyrics_data['segments'])} segments.")
             print("Redistributing timing proportionally...")
 
-            total_duration = lyrics_data['segments'][-1]['end']
-            segment_duration = total_duration / len(new_lines)
-
-            new_segments = []
-            for i, text in enumerate(new_lines):
-                new_segments.append({
-                    'start': i * segment_duration,
-                    'end': (i + 1) * segment_duration,
-                    'text': text
-                })
-
-            lyrics_data['segments'] = new_segments
+            lyrics_data['segments'] = self._redistribute(new_lines, lyrics_data['segments'][-1]['end'])
 
         print(f"\n✓ Replaced with {len(new_lines)} new lines")
         return lyrics_data
 
+    @staticmethod
+    def _redistribute(lines: List[str], total_duration: float) -> List[Segment]:
+        """
+        Spread lines evenly over the song, one equal-length segment each
+
+        Args:
+            lines: Lyric lines, in order
+            total_duration: End time of the last segment in seconds
+
+        Returns:
+            Segments (start, end, text)
+        """
+        # Boundaries are computed in one array, so the segments tile exactly
+        bounds = (np.arange(len(lines) + 1) * (total_duration / len(lines))).tolist()
+        return [
+            {'start': start, 'end': end, 'text': text}
+            for start, end, text in zip(bounds, bounds[1:], lines)
+        ]
+
     def _save_lyrics_to_file(self, lyrics_data: Dict, title: str):
         """Save lyrics to a text file for external editing"""
         filename = f"{title.replace('/', '_')}_lyrics.txt"
@@ -243,18 +283,7 @@ class InteractiveKaraokeMaker:
                 return lyrics_data
 
             # Redistribute timing
-            total_duration = lyrics_data['segments'][-1]['end']
-            segment_duration = total_duration / len(new_lines)
-
-            new_segments = []
-            for i, text in enumerate(new_lines):
-                new_segments.append({
-                    'start': i * segment_duration,
-                    'end': (i + 1) * segment_duration,
-                    'text': text
-                })
-
-            lyrics_data['segments'] = new_segments
+            lyrics_data['segments'] = self._redistribute(new_lines, lyrics_data['segments'][-1]['end'])
             print(f"\n✓ Loaded {len(new_lines)} lines from file")
             return lyrics_data
 
@@ -277,10 +306,7 @@ class InteractiveKaraokeMaker:
         print("="*70)
 
         # Generate output filename
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
-        output_filename = f"{safe_title}_{timestamp}_karaoke.mp4"
+        output_filename = karaoke_filename(title)
         output_path = OUTPUT_DIR / output_filename
 
         print(f"\nGenerating video (this takes 3-5 minutes)...")
@@ -288,20 +314,35 @@ class InteractiveKaraokeMaker:
 
         return str(output_path)
 
-    def create(self, youtube_url: str):
+    def create(self, youtube_url: str, skip_separation: bool = False):
         """
         Create karaoke video with interactive lyrics editing
 
         Args:
             youtube_url: YouTube video URL
+            skip_separation: Use the downloaded audio as the instrumental
+                             instead of separating the vocals out
         """
         try:
             # Step 1: Download and extract
-            audio_path, instrumental_path, lyrics_data, title = self.step1_download_and_extract(youtube_url)
-
-            # Step 2: Edit lyrics
+            audio_path, instrumental_path, lyrics_data, title = self.step1_download_and_extract(
+                youtube_url, skip_separation=skip_separation
+            )
+
+            # Separation and transcription are done, so free the models
+            # before the editing and video steps (they reload if needed)
+            self.separator.unload()
+            self.lyrics_extractor.unload()
+
+            # Step 2: Edit lyrics, while the video generator does its
+            # lyrics-independent setup in the background
+            warm_up = self._pool.submit(self.video_generator.warm_up)
             lyrics_data = self.step2_edit_lyrics(lyrics_data, title)
 
+            # A failed warm-up isn't fatal; generate() redoes what's missing
+            if warm_up.exception() is not None:
+                logger.warning(f"Video generator warm-up failed: {warm_up.exception()}")
+
             # Step 3: Generate video
             output_path = self.step3_generate_video(instrumental_path, lyrics_data, title)
 
@@ -315,17 +356,29 @@ class InteractiveKaraokeMaker:
             logger.error(f"Error: {e}")
             raise
 
+    def close(self):
+        """Wait for any background work and stop the worker threads"""
+        self._pool.shutdown(wait=True)
+
 
 def main():
     """Main entry point"""
-    if len(sys.argv) < 2:
-        print("Usage: python karaoke_maker_interactive.py <youtube_url>")
-        sys.exit(1)
-
-    youtube_url = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description='Create a karaoke video, reviewing the lyrics before rendering'
+    )
+    parser.add_argument('url', help='YouTube video URL')
+    parser.add_argument(
+        '--skip-separation',
+        action='store_true',
+        help='The video is already an instrumental/karaoke track; skip Demucs'
+    )
+    args = parser.parse_args()
 
     maker = InteractiveKaraokeMaker()
-    maker.create(youtube_url)
+    try:
+        maker.create(args.url, skip_separation=args.skip_separation)
+    finally:
+        maker.close()
 
 
 if __name__ == '__main__':
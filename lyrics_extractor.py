@@ -1,18 +1,32 @@
 """
-Lyrics extraction module using Whisper
+Lyrics extraction module using Whisper (faster-whisper / CTranslate2)
 Transcribes audio and extracts timestamped lyrics
 """
 import logging
 import os
+import threading
+from functools import lru_cache
 
 # Ensure ffmpeg is in PATH (for Homebrew on macOS)
 os.environ['PATH'] = '/opt/homebrew/bin:' + os.environ.get('PATH', '')
 
-import whisper
+import faster_whisper
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 import json
 
+import numpy as np
+
+from audio_loader import WHISPER_SAMPLE_RATE, load_audio, to_whisper_audio
+from utils import audio_fingerprint, release_memory, resolve_device
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 try:
     from indic_transliteration import sanscript
     from indic_transliteration.sanscript import transliterate
@@ -20,33 +34,160 @@ try:
 except ImportError:
     TRANSLITERATION_AVAILABLE = False
 
-logging.basicConfig(level=logging.INFO)
+# Languages whose lyrics are romanized, and the script Whisper writes them in
+TRANSLITERATION_SCRIPTS = {
+    'bn': 'BENGALI', 'as': 'BENGALI',
+    'hi': 'DEVANAGARI', 'mr': 'DEVANAGARI', 'sa': 'DEVANAGARI',
+    'pa': 'GURMUKHI',
+    'ur': 'URDU',
+    'ta': 'TAMIL',
+    'te': 'TELUGU',
+}
+
 logger = logging.getLogger(__name__)
 
+# Model used for model_size='auto': base is close to small on English at a
+# third of the cost, CJK benefits from medium, everything else gets small
+AUTO_MODEL_BY_LANGUAGE = {'en': 'base', 'zh': 'medium', 'ja': 'medium', 'ko': 'medium'}
+AUTO_MODEL_DEFAULT = 'small'
+
+# Songs longer than this are split on silence (Silero VAD) and the chunks
+# decoded as a batch; shorter ones gain nothing from it
+BATCH_MIN_SECONDS = 60
+
+# Diacritics in IAST romanization and their plain-ASCII spellings. Applied
+# with str.replace, which is a C scan returning the same string when there's
+# no match (faster here than str.translate or a regex on diacritic-dense text)
+DIACRITIC_REPLACEMENTS = (
+    ('ā', 'a'), ('ī', 'i'), ('ū', 'u'), ('ē', 'e'), ('ō', 'o'),
+    ('ṛ', 'ri'), ('ṝ', 'ri'), ('ḷ', 'l'), ('ḹ', 'l'),
+    ('ṃ', 'm'), ('ṁ', 'm'), ('ṅ', 'n'), ('ñ', 'n'), ('ṇ', 'n'), ('ṭ', 't'),
+    ('ḍ', 'd'), ('ś', 'sh'), ('ṣ', 'sh'), ('ḥ', 'h'),
+    ('Ā', 'A'), ('Ī', 'I'), ('Ū', 'U'), ('Ē', 'E'), ('Ō', 'O'),
+    ('Ṛ', 'Ri'), ('Ṝ', 'Ri'), ('Ḷ', 'L'), ('Ḹ', 'L'),
+    ('Ṃ', 'M'), ('Ṁ', 'M'), ('Ṅ', 'N'), ('Ñ', 'N'), ('Ṇ', 'N'), ('Ṭ', 'T'),
+    ('Ḍ', 'D'), ('Ś', 'Sh'), ('Ṣ', 'Sh'), ('Ḥ', 'H'),
+)
+
+
+def strip_diacritics(text: str) -> str:
+    """Replace IAST diacritics with plain-ASCII spellings"""
+    for diacritic, plain in DIACRITIC_REPLACEMENTS:
+        text = text.replace(diacritic, plain)
+    return text
+
+
+# Seconds of audio the tiny model listens to when detecting the language
+DETECT_SECONDS = 30
+
+# Serializes model loads, so concurrent first uses load the weights once
+_model_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _load_whisper(model_size: str, device: str, compute_type: str) -> WhisperModel:
+    """Load a Whisper model, memoized per process on its settings"""
+    logger.info(f"Loading Whisper model: {model_size} (device: {device}, compute: {compute_type})")
+    model = WhisperModel(model_size, device=device, compute_type=compute_type)
+    logger.info("Whisper model loaded successfully")
+    return model
+
 
 class LyricsExtractor:
     """Extracts timestamped lyrics using Whisper"""
 
-    def __init__(self, model_size: str = 'base', language: str = None):
+    def __init__(
+        self,
+        model_size: str = 'base',
+        language: str = None,
+        device: str = 'auto',
+        compute_type: str = 'auto',
+        cache_dir: Optional[Path] = None,
+        batch_size: int = 4
+    ):
         """
         Initialize lyrics extractor
 
         Args:
-            model_size: Whisper model size (tiny, base, small, medium, large)
+            model_size: Whisper model size (tiny, base, small, medium, large), or
+                        'auto' to pick one per song from the detected language
             language: Language code (e.g., 'en', 'es'), None for auto-detect
+            device: Device to use ('cpu', 'cuda' or 'auto' to use CUDA when available;
+                    CTranslate2 has no MPS backend, so Apple GPUs run on CPU)
+            compute_type: CTranslate2 compute type ('int8', 'float16', ...) or 'auto'
+                          for float16 on GPU and int8 on CPU
+            cache_dir: Directory to keep transcripts in, keyed by audio content,
+                       model, language and faster-whisper version; None disables
+            batch_size: Speech chunks decoded at once for songs over a minute;
+                        1 decodes sequentially
         """
         self.model_size = model_size
         self.language = language
-        logger.info(f"Loading Whisper model: {model_size}")
-        self.model = whisper.load_model(model_size)
-        logger.info("Whisper model loaded successfully")
+        self.device = resolve_device(device, allow_mps=False)
+        if compute_type == 'auto':
+            compute_type = 'float16' if self.device == 'cuda' else 'int8'
+        self.compute_type = compute_type
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Load a fixed model up front; 'auto' loads per song
+        if model_size != 'auto':
+            self._get_model(model_size)
+
+    def _get_model(self, model_size: str) -> WhisperModel:
+        """Load a Whisper model on first use; every extractor in the process shares it"""
+        with _model_lock:
+            return _load_whisper(model_size, self.device, self.compute_type)
+
+    def unload(self):
+        """
+        Free the loaded Whisper models (shared with other extractors) until
+        the next extract() needs them again
+        """
+        with _model_lock:
+            _load_whisper.cache_clear()
+        release_memory()
 
-    def extract(self, audio_path: str) -> Dict:
+    def _select_model(self, audio: np.ndarray) -> WhisperModel:
+        """
+        Pick the model for a song
+
+        Args:
+            audio: 16kHz mono samples
+
+        Returns:
+            The fixed model, or for 'auto' the model suited to the language
+            detected by the tiny model on the first seconds of audio
+        """
+        if self.model_size != 'auto':
+            return self._get_model(self.model_size)
+
+        language = self.language
+        if language is None:
+            _, info = self._get_model('tiny').transcribe(audio[:DETECT_SECONDS * WHISPER_SAMPLE_RATE])
+            language = info.language
+            logger.info(f"Detected language: {language} ({info.language_probability:.0%})")
+
+        return self._get_model(AUTO_MODEL_BY_LANGUAGE.get(language, AUTO_MODEL_DEFAULT))
+
+    def _cache_path(self, audio_path: Path) -> Path:
+        """Where the transcript of this audio with the current settings is cached"""
+        language = self.language or 'auto'
+        return self.cache_dir / (
+            f"{audio_fingerprint(audio_path)}_{self.model_size}_{language}_{faster_whisper.__version__}.json"
+        )
+
+    def extract(self, audio_path: str, audio: np.ndarray = None) -> Dict:
         """
         Extract timestamped lyrics from audio
 
         Args:
             audio_path: Path to audio file
+            audio: Already decoded 16kHz mono samples; when omitted the file is
+                   decoded through the shared loader, so a song the separator
+                   just processed isn't decoded again
 
         Returns:
             Dictionary with lyrics and timestamps
@@ -56,84 +197,94 @@ class LyricsExtractor:
         if not audio_path.exists():
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
 
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = self._cache_path(audio_path)
+            if cache_path.exists():
+                try:
+                    if ORJSON_AVAILABLE:
+                        lyrics_data = orjson.loads(cache_path.read_bytes())
+                    else:
+                        with open(cache_path, 'r', encoding='utf-8') as f:
+                            lyrics_data = json.load(f)
+                    logger.info(f"Using cached lyrics: {cache_path}")
+                    return lyrics_data
+                except (ValueError, OSError) as e:
+                    # JSONDecodeError (json's and orjson's) is a ValueError;
+                    # a damaged entry would otherwise fail this song forever
+                    logger.warning(f"Discarding unreadable cached lyrics {cache_path}: {e}")
+                    cache_path.unlink(missing_ok=True)
+
         logger.info(f"Transcribing audio with Whisper...")
         logger.info(f"This may take 1-2 minutes...")
 
         try:
-            # Transcribe with word-level timestamps
-            result = self.model.transcribe(
-                str(audio_path),
-                language=self.language,
-                word_timestamps=True,
-                verbose=False
-            )
+            if audio is None:
+                audio = to_whisper_audio(load_audio(audio_path))
+
+            # Transcribe with word-level timestamps (segments are decoded lazily)
+            model = self._select_model(audio)
+            options = {
+                'language': self.language,
+                'word_timestamps': True,
+                'vad_filter': True,
+                'beam_size': 1,
+            }
+            if self.batch_size > 1 and len(audio) > BATCH_MIN_SECONDS * WHISPER_SAMPLE_RATE:
+                # Chunks are cut at silences and decoded together in one
+                # batched call; timestamps come back relative to the song
+                segments, info = BatchedInferencePipeline(model).transcribe(
+                    audio, batch_size=self.batch_size, **options
+                )
+            else:
+                segments, info = model.transcribe(audio, **options)
+            segments = list(segments)
+            language = info.language
 
             # Extract segments with timestamps
             lyrics_data = {
-                'full_text': result['text'],
-                'language': result['language'],
+                'full_text': ''.join(segment.text for segment in segments),
+                'language': language,
                 'segments': []
             }
 
             # Detect if we need transliteration based on language
-            needs_transliteration = result['language'] in ['bn', 'hi', 'ur', 'pa', 'mr', 'ta', 'te']
+            needs_transliteration = language in TRANSLITERATION_SCRIPTS
+            source_script = None
+            if needs_transliteration and TRANSLITERATION_AVAILABLE:
+                # None if this indic-transliteration release lacks the scheme
+                source_script = getattr(sanscript, TRANSLITERATION_SCRIPTS[language], None)
+            elif needs_transliteration:
+                logger.warning("Transliteration needed but indic-transliteration not installed")
 
-            for segment in result['segments']:
-                text = segment['text'].strip()
+            for segment in segments:
+                text = segment.text.strip()
 
                 # Transliterate Indic scripts to Roman if available
-                if needs_transliteration and TRANSLITERATION_AVAILABLE:
+                if source_script is not None:
+                    original = text
                     try:
                         # Use IAST first, then clean up diacritics for readable romanization
-                        if result['language'] in ['bn', 'as']:
-                            text = transliterate(text, sanscript.BENGALI, sanscript.IAST)
-                        elif result['language'] in ['hi', 'mr', 'sa']:
-                            text = transliterate(text, sanscript.DEVANAGARI, sanscript.IAST)
-                        elif result['language'] == 'ur':
-                            text = transliterate(text, sanscript.URDU, sanscript.IAST)
-                        elif result['language'] == 'ta':
-                            text = transliterate(text, sanscript.TAMIL, sanscript.IAST)
-                        elif result['language'] == 'te':
-                            text = transliterate(text, sanscript.TELUGU, sanscript.IAST)
-
-                        # Clean up diacritics for better readability
-                        # Remove common diacritical marks
-                        text = (text
-                            .replace('ā', 'a').replace('ī', 'i').replace('ū', 'u')
-                            .replace('ē', 'e').replace('ō', 'o')
-                            .replace('ṛ', 'ri').replace('ṝ', 'ri')
-                            .replace('ḷ', 'l').replace('ḹ', 'l')
-                            .replace('ṃ', 'm').replace('ṁ', 'm').replace('ṅ', 'n')
-                            .replace('ñ', 'n').replace('ṇ', 'n').replace('ṭ', 't')
-                            .replace('ḍ', 'd').replace('ś', 'sh').replace('ṣ', 'sh')
-                            .replace('ḥ', 'h').replace('Ā', 'A').replace('Ī', 'I')
-                            .replace('Ū', 'U').replace('Ē', 'E').replace('Ō', 'O')
-                            .replace('Ṛ', 'Ri').replace('Ṝ', 'Ri')
-                            .replace('Ḷ', 'L').replace('Ḹ', 'L')
-                            .replace('Ṃ', 'M').replace('Ṁ', 'M').replace('Ṅ', 'N')
-                            .replace('Ñ', 'N').replace('Ṇ', 'N').replace('Ṭ', 'T')
-                            .replace('Ḍ', 'D').replace('Ś', 'Sh').replace('Ṣ', 'Sh')
-                            .replace('Ḥ', 'H')
-                        )
-
-                        logger.debug(f"Transliterated: {segment['text'].strip()} -> {text}")
+                        text = strip_diacritics(transliterate(text, source_script, sanscript.IAST))
+                        logger.debug(f"Transliterated: {original} -> {text}")
                     except Exception as e:
                         logger.warning(f"Transliteration failed for segment, using original: {e}")
-                        text = segment['text'].strip()
-                elif needs_transliteration and not TRANSLITERATION_AVAILABLE:
-                    logger.warning("Transliteration needed but indic-transliteration not installed")
+                        text = original
 
                 lyrics_data['segments'].append({
-                    'start': segment['start'],
-                    'end': segment['end'],
+                    'start': segment.start,
+                    'end': segment.end,
                     'text': text
                 })
 
             logger.info(f"Transcription complete!")
-            logger.info(f"Language detected: {result['language']}")
+            logger.info(f"Language detected: {language}")
             logger.info(f"Total segments: {len(lyrics_data['segments'])}")
-            if needs_transliteration and TRANSLITERATION_AVAILABLE:
-                logger.info(f"Applied transliteration for {result['language']}")
+            if source_script is not None:
+                logger.info(f"Applied transliteration for {language}")
+
+            if cache_path is not None:
+                self.save_lyrics(lyrics_data, cache_path)
 
             return lyrics_data
 
@@ -149,8 +300,23 @@ class LyricsExtractor:
             lyrics_data: Lyrics dictionary from extract()
             output_path: Path to save JSON file
         """
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(lyrics_data, f, indent=2, ensure_ascii=False)
+        output_path = Path(output_path)
+        # The transcript cache may have been emptied since __init__
+        # (KaraokeMaker clears its temp directory after every song)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written under a temporary name and moved into place, so an
+        # interrupted save never leaves a truncated file (or cache entry)
+        partial_path = output_path.with_name(f"{output_path.stem}.partial{output_path.suffix}")
+        if ORJSON_AVAILABLE:
+            # Same layout as json.dump(indent=2, ensure_ascii=False), several times faster
+            partial_path.write_bytes(
+                orjson.dumps(lyrics_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+            )
+        else:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                json.dump(lyrics_data, f, indent=2, ensure_ascii=False)
+        partial_path.replace(output_path)
         logger.info(f"Lyrics saved to: {output_path}")
 
     def format_for_karaoke(self, lyrics_data: Dict, lines_per_screen: int = 2) -> List[Dict]:
@@ -196,6 +362,7 @@ def extract_lyrics(audio_path: str, model_size: str = 'base') -> Dict:
 
 if __name__ == '__main__':
     # Test the extractor
+    logging.basicConfig(level=logging.INFO)
     import sys
     if len(sys.argv) > 1:
         test_audio = sys.argv[1]
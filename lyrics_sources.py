@@ -0,0 +1,72 @@
+"""
+Lyrics sources for the karaoke pipeline
+Each source produces the {'text', 'segments': [...]} lyrics dictionary for a song
+"""
+import json
+from typing import Dict, Protocol
+
+from subtitle_importer import import_subtitles
+
+
+class LyricsSource(Protocol):
+    """Where a song's timed lyrics come from"""
+
+    def load(self, audio_path: str) -> Dict:
+        """
+        Get timed lyrics for a song
+
+        Args:
+            audio_path: Path to the song's audio
+
+        Returns:
+            Lyrics dictionary with 'segments' (start, end, text)
+        """
+        ...
+
+
+class WhisperSource:
+    """Transcribes lyrics from the audio with a LyricsExtractor"""
+
+    def __init__(self, extractor):
+        """
+        Args:
+            extractor: LyricsExtractor to transcribe with (kept loaded between
+                       songs; give it a cache_dir to reuse transcripts)
+        """
+        self.extractor = extractor
+
+    def load(self, audio_path: str) -> Dict:
+        return self.extractor.extract(audio_path)
+
+
+class JsonSource:
+    """Lyrics from a karaoke-maker JSON file (e.g. from the web editor)"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path to the JSON lyrics file
+
+        The file is read here, so a bad file fails before any audio work starts.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            self.lyrics_data = json.load(f)
+
+    def load(self, audio_path: str) -> Dict:
+        return self.lyrics_data
+
+
+class SubtitleSource:
+    """Lyrics from an .srt or .ass subtitle file"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path to the subtitle file
+
+        The file is parsed here, so a bad file fails before any audio work starts.
+        """
+        self.lyrics_data = import_subtitles(path)
+
+    def load(self, audio_path: str) -> Dict:
+        return self.lyrics_data
@@ -0,0 +1,83 @@
+"""
+Shared pipeline components for the web apps
+Creates the downloader, separator, lyrics extractor and video generator once per process
+"""
+import copy
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+from downloader import YouTubeDownloader
+from separator import VocalSeparator
+from lyrics_extractor import LyricsExtractor
+from video_generator import KaraokeVideoGenerator
+from config import DEMUCS_QUANTIZE, WHISPER_DEVICE
+from utils import audio_fingerprint
+
+# Working directory for downloads, stems and the transcript cache
+TEMP_DIR = Path(tempfile.gettempdir()) / 'karaoke-temp'
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+
+# Pipeline components are created on first use and reused across requests,
+# so the Demucs and Whisper weights are only loaded once per process
+_downloader = None
+_separator = None
+_extractor = None
+_generator = None
+_components_lock = threading.Lock()
+
+
+def get_downloader() -> YouTubeDownloader:
+    """Return the shared YouTube downloader, creating it on first use"""
+    global _downloader
+    with _components_lock:
+        if _downloader is None:
+            _downloader = YouTubeDownloader(TEMP_DIR)
+        return _downloader
+
+
+def get_separator() -> VocalSeparator:
+    """Return the shared vocal separator, creating it on first use"""
+    global _separator
+    with _components_lock:
+        if _separator is None:
+            _separator = VocalSeparator(TEMP_DIR, quantize=DEMUCS_QUANTIZE)
+        return _separator
+
+
+def get_extractor() -> LyricsExtractor:
+    """Return the shared lyrics extractor, loading Whisper on first use"""
+    global _extractor
+    with _components_lock:
+        if _extractor is None:
+            _extractor = LyricsExtractor(
+                device=WHISPER_DEVICE,
+                cache_dir=TEMP_DIR / 'whisper_cache'
+            )
+        return _extractor
+
+
+def get_generator() -> KaraokeVideoGenerator:
+    """Return the shared video generator, creating it on first use"""
+    global _generator
+    with _components_lock:
+        if _generator is None:
+            _generator = KaraokeVideoGenerator()
+        return _generator
+
+
+def load_or_extract_lyrics(audio_path: str) -> Dict:
+    """Extract lyrics, reusing the result when this audio was transcribed before"""
+    extractor = get_extractor()
+    result = _lyrics_for_audio(
+        audio_fingerprint(audio_path), extractor.model_size, extractor.language, audio_path
+    )
+    # Callers get their own copy so the cached result can't be modified
+    return copy.deepcopy(result)
+
+
+@lru_cache(maxsize=16)
+def _lyrics_for_audio(audio_key: str, model_size: str, language: str, audio_path: str) -> Dict:
+    """Lyrics for an audio hash and model, from memory or the extractor (which keeps the JSON cache)"""
+    return get_extractor().extract(audio_path)
@@ -0,0 +1,12 @@
+"""
+Timed lyric segments
+The segment shape shared by the extractor, the subtitle importer, the editors and the video generator
+"""
+from typing import TypedDict
+
+
+class Segment(TypedDict):
+    """One timed lyric line; plain dicts of this shape go straight to JSON and the web editors"""
+    start: float
+    end: float
+    text: str
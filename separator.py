@@ -2,39 +2,151 @@
 Vocal separation module using Demucs
 Separates vocals from instrumental tracks
 """
+import json
 import logging
-import subprocess
+import os
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
-import shutil
+from typing import Dict, Optional
+
+from audio_loader import load_audio
+from utils import audio_fingerprint, release_memory, resolve_device
+
+# Ensure ffmpeg is in PATH (for Homebrew on macOS)
+os.environ['PATH'] = '/opt/homebrew/bin:' + os.environ.get('PATH', '')
+
+# A few Demucs ops have no MPS kernel yet; let torch run those on the CPU
+# (read when torch is imported, which happens lazily below)
+os.environ.setdefault('PYTORCH_ENABLE_MPS_FALLBACK', '1')
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stems are written as 16-bit FLAC: lossless, several times faster to encode
+# than 320k MP3, and about half the size of WAV
+STEM_EXTENSION = '.flac'
+
+# Serializes model loads, so concurrent first uses load the weights once
+_model_lock = threading.Lock()
+
+
+@lru_cache(maxsize=2)
+def _load_demucs(model_name: str, device: str, quantize: bool):
+    """
+    Load Demucs weights onto a device, memoized per process on its settings
+
+    Args:
+        model_name: Pretrained model name (htdemucs, ...)
+        device: Torch device
+        quantize: Run the Linear/LSTM layers with dynamic int8 weights (CPU only)
+
+    Returns:
+        The model, in eval mode
+    """
+    from demucs.pretrained import get_model
+
+    if device == 'cuda':
+        precision = 'fp16'
+    else:
+        precision = 'int8 dynamic' if quantize else 'fp32'
+    logger.info(f"Loading Demucs model: {model_name} (device: {device}, {precision})")
+    model = get_model(model_name)
+    model.to(device)
+    model.eval()
+
+    if quantize:
+        import torch
+
+        # Convolutions (including the STFT branch) stay fp32
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+        )
+
+    return model
+
 
 class VocalSeparator:
     """Separates vocals from audio using Demucs"""
 
-    def __init__(self, output_dir: Path, model: str = 'htdemucs', device: str = 'cpu'):
+    def __init__(
+        self,
+        output_dir: Path,
+        model: str = 'htdemucs',
+        device: str = 'auto',
+        segment: float = 7.8,
+        overlap: float = 0.1,
+        shifts: int = 0,
+        quantize: bool = False
+    ):
         """
         Initialize vocal separator
 
         Args:
             output_dir: Directory to save separated tracks
             model: Demucs model to use (htdemucs, htdemucs_ft, mdx_extra)
-            device: Device to use ('cpu' or 'cuda')
+            device: Device to use ('cpu', 'cuda', 'mps' or 'auto' to use CUDA,
+                    then Apple's MPS, when available)
+            segment: Length in seconds of the chunks fed to the model (bounds GPU memory)
+            overlap: Overlap between consecutive chunks (0.0 to 1.0)
+            shifts: Number of random shifts for equivariant stabilization (0 = fastest)
+            quantize: On CPU, run the Linear/LSTM layers with dynamic int8 weights
         """
         self.output_dir = output_dir
         self.model = model
-        self.device = device
+        self.device = resolve_device(device)
+        self.segment = segment
+        self.overlap = overlap
+        self.shifts = shifts
+        self.quantize = quantize and self.device == 'cpu'
+        self._model = None
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def separate(self, audio_path: str) -> Dict[str, str]:
+    def _load_model(self):
+        """Load the Demucs model on first use; every separator in the process shares it"""
+        if self._model is None:
+            with _model_lock:
+                self._model = _load_demucs(self.model, self.device, self.quantize)
+        return self._model
+
+    def unload(self):
+        """
+        Free the loaded Demucs model (shared with other separators) until the
+        next separate() needs it again
+        """
+        self._model = None
+        with _model_lock:
+            _load_demucs.cache_clear()
+        release_memory()
+
+    def _settings(self) -> Dict:
+        """Settings that change the stems, recorded next to cached output"""
+        return {
+            'model': self.model,
+            'segment': self.segment,
+            'overlap': self.overlap,
+            'shifts': self.shifts,
+            'quantize': self.quantize,
+        }
+
+    @staticmethod
+    def _read_meta(meta_path: Path) -> Optional[Dict]:
+        """Settings a cached separation was made with, or None if unknown"""
+        try:
+            return json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def separate(self, audio_path: str, name: Optional[str] = None, wav=None) -> Dict[str, str]:
         """
         Separate vocals from instrumental
 
         Args:
             audio_path: Path to input audio file
+            name: Output folder name (defaults to a hash of the audio content).
+                  Stems already in the folder are reused when they were made
+                  with the same settings.
+            wav: Already decoded audio (channels, samples) at the model's sample
+                 rate; decoded from audio_path when omitted
 
         Returns:
             Dictionary with paths to separated tracks
@@ -44,54 +156,70 @@ class VocalSeparator:
         if not audio_path.exists():
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
 
+        # Layout matches the demucs CLI (output_dir/model_name/track/), with the
+        # track named by content so the same song is only ever separated once
+        separated_dir = self.output_dir / self.model / (name or audio_fingerprint(audio_path))
+        vocals_path = separated_dir / f"vocals{STEM_EXTENSION}"
+        instrumental_path = separated_dir / f"no_vocals{STEM_EXTENSION}"
+        meta_path = separated_dir / 'meta.json'
+
+        if vocals_path.exists() and instrumental_path.exists() and self._read_meta(meta_path) == self._settings():
+            logger.info(f"Using cached separation: {separated_dir}")
+            return {
+                'vocals': str(vocals_path),
+                'instrumental': str(instrumental_path),
+                'original': str(audio_path)
+            }
+
         logger.info(f"Starting vocal separation with Demucs...")
         logger.info(f"Model: {self.model}, Device: {self.device}")
         logger.info(f"This may take 2-3 minutes for a 4-minute song...")
 
         try:
-            # Run demucs command via Python module
-            cmd = [
-                'python3', '-m', 'demucs',
-                '--two-stems', 'vocals',  # Only separate vocals and accompaniment
-                '--out', str(self.output_dir),
-                '--device', self.device,
-                '--name', self.model,
-                '--mp3',  # Output as MP3
-                '--mp3-bitrate', '320',  # High quality MP3
-                str(audio_path)
-            ]
-
-            # Get current environment and add homebrew to PATH
-            import os
-            env = os.environ.copy()
-            env['PATH'] = '/opt/homebrew/bin:' + env.get('PATH', '')
-            
-            result = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True,
-                env=env
-            )
+            import torch
+            from demucs.apply import apply_model
+            from demucs.audio import save_audio
 
-            logger.info("Vocal separation complete!")
+            model = self._load_model()
+
+            # Decode (shared with the lyrics extractor) and normalize the mix
+            # the same way the demucs CLI does
+            if wav is None:
+                wav = load_audio(audio_path, model.samplerate, model.audio_channels)
+            ref = wav.mean(0)
+            mean, std = ref.mean(), ref.std()
+            wav = (wav - mean) / std
 
-            # Find the separated files
-            # Demucs creates: output_dir/model_name/audio_filename/vocals.mp3 and no_vocals.mp3
-            song_name = audio_path.stem
-            separated_dir = self.output_dir / self.model / song_name
+            # Chunked inference, in half precision on GPU
+            with torch.inference_mode(), torch.autocast(
+                'cuda', dtype=torch.float16, enabled=self.device == 'cuda'
+            ):
+                sources = apply_model(
+                    model,
+                    wav[None],
+                    device=self.device,
+                    split=True,
+                    segment=self.segment,
+                    overlap=self.overlap,
+                    shifts=self.shifts
+                )[0]
+            sources = sources.float().cpu() * std + mean
 
-            vocals_path = separated_dir / 'vocals.mp3'
-            instrumental_path = separated_dir / 'no_vocals.mp3'
+            # Two stems: vocals and everything else
+            vocals_index = model.sources.index('vocals')
+            vocals = sources[vocals_index]
+            instrumental = sources.sum(0) - vocals
 
-            # If mp3 files don't exist, try wav
-            if not vocals_path.exists():
-                vocals_path = separated_dir / 'vocals.wav'
-            if not instrumental_path.exists():
-                instrumental_path = separated_dir / 'no_vocals.wav'
+            logger.info("Vocal separation complete!")
 
-            if not instrumental_path.exists():
-                raise FileNotFoundError(f"Separated files not found in {separated_dir}")
+            # Stems are written under temporary names and moved into place
+            # together, so an interrupted save is never mistaken for a cached one
+            separated_dir.mkdir(parents=True, exist_ok=True)
+            for stem, path in ((vocals, vocals_path), (instrumental, instrumental_path)):
+                save_audio(stem, path.with_name(f"{path.stem}.partial{STEM_EXTENSION}"), model.samplerate)
+            for path in (vocals_path, instrumental_path):
+                path.with_name(f"{path.stem}.partial{STEM_EXTENSION}").replace(path)
+            meta_path.write_text(json.dumps(self._settings()))
 
             return {
                 'vocals': str(vocals_path),
@@ -99,9 +227,6 @@ class VocalSeparator:
                 'original': str(audio_path)
             }
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Demucs error: {e.stderr}")
-            raise
         except Exception as e:
             logger.error(f"Error during separation: {e}")
             raise
@@ -125,6 +250,7 @@ def separate_vocals(audio_path: str, output_dir: Path, model: str = 'htdemucs')
 
 if __name__ == '__main__':
     # Test the separator
+    logging.basicConfig(level=logging.INFO)
     import sys
     if len(sys.argv) > 1:
         test_audio = sys.argv[1]
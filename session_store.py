@@ -0,0 +1,120 @@
+"""
+Per-user session storage for the web apps
+Keeps each browser's workflow state in a small sqlite database keyed by a cookie id
+"""
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+# Cookie carrying the session id
+SESSION_COOKIE = 'karaoke_sid'
+
+
+class SessionStore:
+    """Stores session dictionaries as JSON rows in sqlite"""
+
+    def __init__(self, db_path: Path, defaults: Optional[Dict[str, Any]] = None):
+        """
+        Initialize session store
+
+        Args:
+            db_path: Path to the sqlite database file
+            defaults: Values every new session starts with
+        """
+        self.db_path = Path(db_path)
+        self.defaults = dict(defaults or {})
+        self._local = threading.local()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'sid TEXT PRIMARY KEY, data TEXT NOT NULL)'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite connections can't be shared)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid: str) -> Dict[str, Any]:
+        """
+        Load the stored values of a session
+
+        Args:
+            sid: Session id
+
+        Returns:
+            Session values merged over the defaults
+        """
+        row = self._connect().execute(
+            'SELECT data FROM sessions WHERE sid = ?', (sid,)
+        ).fetchone()
+        data = dict(self.defaults)
+        if row:
+            data.update(json.loads(row[0]))
+        return data
+
+    def update(self, sid: str, values: Dict[str, Any], remove: tuple = ()):
+        """
+        Merge values into a stored session
+
+        The read-modify-write runs in one transaction, so concurrent
+        requests for the same session don't drop each other's keys.
+
+        Args:
+            sid: Session id
+            values: Keys to set (values must be JSON serializable)
+            remove: Keys to delete
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT data FROM sessions WHERE sid = ?', (sid,)
+            ).fetchone()
+            data = json.loads(row[0]) if row else {}
+            data.update(values)
+            for key in remove:
+                data.pop(key, None)
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (sid, data) VALUES (?, ?)',
+                (sid, json.dumps(data, ensure_ascii=False))
+            )
+
+    def get(self, sid: str) -> 'StoredSession':
+        """Return a dict-like view of a session that writes changes through"""
+        return StoredSession(self, sid)
+
+
+class StoredSession(MutableMapping):
+    """Dict-like session whose assignments are saved immediately"""
+
+    def __init__(self, store: SessionStore, sid: str):
+        self.store = store
+        self.sid = sid
+        self._data = store.load(sid)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._data[key] = value
+        self.store.update(self.sid, {key: value})
+
+    def __delitem__(self, key: str):
+        del self._data[key]
+        self.store.update(self.sid, {}, remove=(key,))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
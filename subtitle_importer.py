@@ -6,8 +6,19 @@ import re
 from pathlib import Path
 from typing import List, Dict
 
+from segments import Segment
 
-def parse_srt(file_path: str) -> List[Dict]:
+# ASS override blocks like {\i1}, {\b1} or {\k20} inside dialogue text
+_ASS_TAG_RE = re.compile(r'\{[^}]*\}')
+_ASS_DIALOGUE_PREFIX = 'Dialogue:'
+
+# SRT timing line; '.' is accepted as well as the standard ',' before milliseconds
+_SRT_TIMING_RE = re.compile(
+    r'(\d{2}):(\d{2}):(\d{2})[,.](\d{3}) --> (\d{2}):(\d{2}):(\d{2})[,.](\d{3})'
+)
+
+
+def parse_srt(file_path: str) -> List[Segment]:
     """
     Parse SRT subtitle file
 
@@ -16,47 +27,50 @@ def parse_srt(file_path: str) -> List[Dict]:
     00:00:20,000 --> 00:00:24,400
     Lyric text here
 
+    The file is read line by line, one block at a time, so memory stays
+    flat however long it is.
+
     Returns list of segments with start, end, text
     """
     segments = []
+    block = []
 
     with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Split by double newline
-    blocks = content.strip().split('\n\n')
-
-    for block in blocks:
-        lines = block.strip().split('\n')
-        if len(lines) < 3:
-            continue
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.strip():
+                block.append(line)
+            elif block:
+                # A blank line ends the block
+                _add_srt_block(block, segments)
+                block = []
 
-        # Parse timing line (second line)
-        timing_line = lines[1]
-        match = re.match(r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})', timing_line)
+    if block:
+        _add_srt_block(block, segments)
 
-        if match:
-            # Start time
-            start_h, start_m, start_s, start_ms = map(int, match.groups()[:4])
-            start = start_h * 3600 + start_m * 60 + start_s + start_ms / 1000
+    return segments
 
-            # End time
-            end_h, end_m, end_s, end_ms = map(int, match.groups()[4:])
-            end = end_h * 3600 + end_m * 60 + end_s + end_ms / 1000
 
-            # Text (third line onwards)
-            text = '\n'.join(lines[2:])
+def _add_srt_block(lines: List[str], segments: List[Segment]):
+    """Append the segment for one SRT block (index, timing, text lines), if valid"""
+    if len(lines) < 3:
+        return
 
-            segments.append({
-                'start': start,
-                'end': end,
-                'text': text
-            })
+    # Parse timing line (second line)
+    match = _SRT_TIMING_RE.match(lines[1].strip())
+    if not match:
+        return
 
-    return segments
+    start_h, start_m, start_s, start_ms, end_h, end_m, end_s, end_ms = map(int, match.groups())
+    segments.append({
+        'start': start_h * 3600 + start_m * 60 + start_s + start_ms / 1000,
+        'end': end_h * 3600 + end_m * 60 + end_s + end_ms / 1000,
+        # Text (third line onwards)
+        'text': '\n'.join(lines[2:]).strip()
+    })
 
 
-def parse_ass(file_path: str) -> List[Dict]:
+def parse_ass(file_path: str) -> List[Segment]:
     """
     Parse ASS/SSA subtitle file (Aegisub format)
 
@@ -71,7 +85,7 @@ def parse_ass(file_path: str) -> List[Dict]:
         for line in f:
             line = line.strip()
 
-            if line.startswith('Dialogue:'):
+            if line.startswith(_ASS_DIALOGUE_PREFIX):
                 # Parse dialogue line
                 parts = line.split(',', 9)
                 if len(parts) < 10:
@@ -83,7 +97,7 @@ def parse_ass(file_path: str) -> List[Dict]:
                 text = parts[9]       # Lyric text (may have formatting codes)
 
                 # Remove ASS formatting codes like {\i1}, {\b1}, etc.
-                text = re.sub(r'\{[^}]*\}', '', text)
+                text = _ASS_TAG_RE.sub('', text)
 
                 # Parse start time
                 start = parse_ass_time(start_str)
@@ -0,0 +1,22 @@
+"""Tests for the Gradio app's lyrics text parsing"""
+import pytest
+
+pytest.importorskip('gradio')
+
+from app_gradio import parse_lyrics_text
+
+
+def test_timed_and_untimed_lines():
+    assert parse_lyrics_text("[1.0 - 2.5] first\n\nsecond\n") == [
+        {'start': 1.0, 'end': 2.5, 'text': 'first'},
+        {'start': 3.0, 'end': 5.5, 'text': 'second'},
+    ]
+
+
+def test_leading_whitespace_before_first_timed_line():
+    assert parse_lyrics_text("\t[1.0-2.0] hi\n  [2.0-3.0] there") == [
+        {'start': 1.0, 'end': 2.0, 'text': 'hi'},
+        # As before, only the text as a whole is stripped, so later
+        # indented lines are taken as untimed
+        {'start': 3.0, 'end': 5.5, 'text': '[2.0-3.0] there'},
+    ]
@@ -0,0 +1,58 @@
+"""Tests for running several songs through one KaraokeMaker"""
+import subprocess
+from types import SimpleNamespace
+
+import numpy as np
+
+import karaoke_maker
+import lyrics_extractor
+from karaoke_maker import KaraokeMaker
+from lyrics_extractor import LyricsExtractor
+
+
+class FakeWhisperModel:
+    """Stands in for a faster-whisper model: one segment per song"""
+
+    def transcribe(self, audio, **options):
+        segment = SimpleNamespace(start=0.5, end=1.5, text=' la la la')
+        return iter([segment]), SimpleNamespace(language='en')
+
+
+def make_tone(path, frequency):
+    """Write a short sine tone (distinct frequencies hash differently)"""
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f'sine=f={frequency}:d=2', str(path)],
+        check=True
+    )
+
+
+def test_two_whisper_songs_through_one_maker(tmp_path, monkeypatch):
+    songs = tmp_path / 'songs'
+    songs.mkdir()
+    first, second = songs / 'first.wav', songs / 'second.wav'
+    make_tone(first, 440)
+    make_tone(second, 660)
+
+    # Only the transcript cache is under test; decoding, the models and the
+    # video stage are stubbed out
+    monkeypatch.setattr(lyrics_extractor, 'load_audio', lambda audio_path: None)
+    monkeypatch.setattr(lyrics_extractor, 'to_whisper_audio', lambda audio: np.zeros(32000, dtype=np.float32))
+    monkeypatch.setattr(LyricsExtractor, '_select_model', lambda self, audio: FakeWhisperModel())
+    karaoke_maker.get_lyrics_extractor.cache_clear()
+    monkeypatch.setattr(karaoke_maker, 'get_separator', lambda output_dir: SimpleNamespace(
+        separate=lambda audio_path: {'instrumental': audio_path}
+    ))
+
+    maker = KaraokeMaker(output_dir=tmp_path / 'out', temp_dir=tmp_path / 'temp')
+    rendered = []
+    monkeypatch.setattr(maker.video_generator, 'generate',
+                        lambda audio_path, lyrics_data, output_path, title=None: rendered.append(lyrics_data))
+
+    try:
+        # The first song's cleanup empties the temp dir, cache included
+        maker.create(str(first))
+        maker.create(str(second))
+    finally:
+        karaoke_maker.get_lyrics_extractor.cache_clear()
+
+    assert [lyrics['segments'][0]['text'] for lyrics in rendered] == ['la la la', 'la la la']
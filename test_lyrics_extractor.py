@@ -0,0 +1,39 @@
+"""Tests for the LyricsExtractor transcript cache"""
+import json
+import subprocess
+from types import SimpleNamespace
+
+import numpy as np
+
+import lyrics_extractor
+from lyrics_extractor import LyricsExtractor
+
+
+class FakeWhisperModel:
+    """Stands in for a faster-whisper model: one segment per song"""
+
+    def transcribe(self, audio, **options):
+        segment = SimpleNamespace(start=0.5, end=1.5, text=' la la la')
+        return iter([segment]), SimpleNamespace(language='en')
+
+
+def test_truncated_cache_entry_is_transcribed_again(tmp_path, monkeypatch):
+    audio_path = tmp_path / 'song.wav'
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=f=440:d=2', str(audio_path)],
+        check=True
+    )
+    monkeypatch.setattr(lyrics_extractor, 'load_audio', lambda audio_path: None)
+    monkeypatch.setattr(lyrics_extractor, 'to_whisper_audio', lambda audio: np.zeros(32000, dtype=np.float32))
+    monkeypatch.setattr(LyricsExtractor, '_select_model', lambda self, audio: FakeWhisperModel())
+
+    extractor = LyricsExtractor(model_size='auto', cache_dir=tmp_path / 'cache')
+    cache_path = extractor._cache_path(audio_path)
+    # What an interrupted save used to leave behind
+    cache_path.write_text('{"full_text": " la la', encoding='utf-8')
+
+    lyrics_data = extractor.extract(str(audio_path))
+
+    assert lyrics_data['segments'][0]['text'] == 'la la la'
+    assert json.loads(cache_path.read_text(encoding='utf-8')) == lyrics_data
+    assert list(cache_path.parent.iterdir()) == [cache_path]
@@ -0,0 +1,148 @@
+"""
+Shared helpers for Karaoke Maker
+Device selection and other small utilities used across modules
+"""
+import gc
+import mmap
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Union
+
+import xxhash
+
+# Runs of anything but letters, digits, spaces, '-' and '_' (any script)
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w \-]+')
+
+
+def resolve_device(device: str = 'auto', allow_mps: bool = True) -> str:
+    """
+    Resolve a device setting to a concrete torch device
+
+    Args:
+        device: 'auto' to pick CUDA, then Apple's MPS, when available, or an
+                explicit 'cpu'/'cuda'/'mps'
+        allow_mps: Whether 'auto' may pick MPS (False for backends without
+                   MPS support, such as CTranslate2)
+
+    Returns:
+        Device name to pass to torch
+    """
+    if device != 'auto':
+        return device
+
+    try:
+        import torch
+    except ImportError:
+        return 'cpu'
+
+    if torch.cuda.is_available():
+        return 'cuda'
+    if allow_mps and torch.backends.mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+
+def limit_cpu_threads(num_threads: int):
+    """
+    Cap the CPU threads the math libraries use in this process
+
+    Sets OMP_NUM_THREADS/MKL_NUM_THREADS (unless already set), which torch,
+    numpy and CTranslate2 read when they start, and resizes torch's pools
+    if torch is already loaded.
+
+    Args:
+        num_threads: Threads per library pool
+    """
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, str(num_threads))
+
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only allowed before any inter-op work has started
+            pass
+
+
+def release_memory():
+    """
+    Return freed model memory to the system
+
+    Collects garbage (model graphs hold reference cycles) and, when torch is
+    loaded, hands its cached GPU blocks back to the driver.
+    """
+    gc.collect()
+
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        if torch.backends.mps.is_available():
+            torch.mps.empty_cache()
+
+
+def audio_fingerprint(path: Union[str, Path]) -> str:
+    """
+    Content hash of an audio file, used as a cache key for derived files
+
+    The separator, the extractor and the apps all key their caches on it, so
+    the hash is remembered per file version (path, size, mtime, inode) and a
+    song is only read once.
+
+    Args:
+        path: Path to the audio file
+
+    Returns:
+        Hex digest (xxh3, 128-bit) of the file contents
+    """
+    stat = os.stat(path)
+    return _hash_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+@lru_cache(maxsize=256)
+def _hash_file(path: str, size: int, mtime_ns: int, inode: int) -> str:
+    """xxh3-128 of a file's contents; the stat fields only key the cache"""
+    if size == 0:
+        # mmap can't map an empty file
+        return xxhash.xxh3_128().hexdigest()
+
+    with open(path, 'rb') as f:
+        # Hashing the mapping reads straight from the page cache, with no
+        # per-chunk copies into Python bytes
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return xxhash.xxh3_128(mapped).hexdigest()
+
+
+def safe_filename(title: str) -> str:
+    """
+    Strip a title down to characters that are safe in a filename
+
+    Args:
+        title: Song or video title
+
+    Returns:
+        Title with only letters, digits, spaces, '-' and '_'
+    """
+    return _UNSAFE_FILENAME_RE.sub('', title).strip()
+
+
+def karaoke_filename(title: str, timestamp: Optional[str] = None) -> str:
+    """
+    Build the timestamped output filename for a karaoke video
+
+    Args:
+        title: Song title
+        timestamp: Timestamp to use (defaults to now, as YYYYmmdd_HHMMSS)
+
+    Returns:
+        Filename like "<title>_<YYYYmmdd_HHMMSS>_karaoke.mp4"
+    """
+    if timestamp is None:
+        timestamp = time.strftime('%Y%m%d_%H%M%S')
+    return f"{safe_filename(title)}_{timestamp}_karaoke.mp4"
@@ -2,23 +2,129 @@
 Video generator module
 Creates karaoke videos with synced lyrics and word-by-word highlighting
 """
+import bisect
 import logging
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Optional
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+import PIL
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import subprocess
 import tempfile
 import os
-from moviepy import (
-    AudioFileClip,
-    VideoFileClip,
-    CompositeVideoClip,
-)
+import av
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Render through ffmpeg + libass subtitles instead of drawing every frame
+FAST_MODE = os.getenv('KARAOKE_FAST') == '1'
+
+# Parts of the timeline rendered and encoded at once in frame mode
+RENDER_WORKERS = int(os.getenv('KARAOKE_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Shortest part worth its own encoder (about 10 seconds at 30 fps)
+MIN_SPAN_FRAMES = 300
+
+# Frame mode draws at this fraction of the output size and ffmpeg scales the
+# frames up (1 = full size; 0.5 moves a quarter of the pixels, softer text)
+RENDER_SCALE = float(os.getenv('KARAOKE_RENDER_SCALE', '1'))
+
+# Lines whose pre-rendered layers are kept for reuse (about 12 MB each at
+# 1080p); enough to hold a chorus
+LAYER_CACHE_SIZE = 8
+
+# Gaps between lines at least this long are filled by ffmpeg's color source
+# instead of piping the same background frame over and over
+MIN_GAP_SECONDS = 2.0
+
+
+@lru_cache(maxsize=16)
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load a TrueType font, reusing it for every generator that asks for the same face and size"""
+    return ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=8192)
+def _text_bbox(font: ImageFont.FreeTypeFont, text: str) -> tuple:
+    """
+    Ink box of text drawn at (0, 0) in a font (what ImageDraw.textbbox
+    returns), memoized: a line is measured while wrapping, laying out and
+    highlighting it, and again whenever a chorus repeats
+    """
+    return font.getbbox(text)
+
+
+def _text_width(font: ImageFont.FreeTypeFont, text: str) -> int:
+    """Ink width of text in a font"""
+    left, _, right, _ = _text_bbox(font, text)
+    return right - left
+
+
+# RGB to BT.601 limited-range YCbCr, the conversion ffmpeg applies to rgb24
+_RGB_TO_YUV = np.array([
+    [65.481, 128.553, 24.966],
+    [-37.797, -74.203, 112.0],
+    [112.0, -93.786, -18.214],
+], dtype=np.float32) / 255
+
+
+def _to_yuv420(rgb: np.ndarray) -> np.ndarray:
+    """
+    Convert an RGB frame (even width and height) to a packed yuv420p buffer
+
+    Args:
+        rgb: Frame as an (height, width, 3) uint8 array
+
+    Returns:
+        Flat uint8 array: the Y plane, then the U and V planes at half size
+    """
+    height, width = rgb.shape[:2]
+    pixels = rgb.astype(np.float32)
+    luma = pixels @ _RGB_TO_YUV[0] + 16
+    # Chroma is taken from the average of each 2x2 block
+    blocks = pixels.reshape(height // 2, 2, width // 2, 2, 3).mean(axis=(1, 3))
+    cb = blocks @ _RGB_TO_YUV[1] + 128
+    cr = blocks @ _RGB_TO_YUV[2] + 128
+    return np.concatenate([
+        np.rint(plane).clip(0, 255).astype(np.uint8).ravel() for plane in (luma, cb, cr)
+    ])
+
+
+def _yuv_planes(buffer: np.ndarray, width: int, height: int) -> tuple:
+    """Y, U and V views (2-D) into a packed yuv420p buffer"""
+    luma_size = width * height
+    chroma_size = luma_size // 4
+    return (
+        buffer[:luma_size].reshape(height, width),
+        buffer[luma_size:luma_size + chroma_size].reshape(height // 2, width // 2),
+        buffer[luma_size + chroma_size:].reshape(height // 2, width // 2),
+    )
+
+
+def _audio_duration(audio_path: str) -> float:
+    """
+    Read an audio file's duration from its container header
+
+    Nothing is decoded; when the container has no overall duration the
+    audio stream's own is used.
+
+    Args:
+        audio_path: Path to the audio file
+
+    Returns:
+        Duration in seconds
+    """
+    with av.open(str(audio_path)) as container:
+        if container.duration is not None:
+            return container.duration / av.time_base
+        stream = container.streams.audio[0]
+        return float(stream.duration * stream.time_base)
+
 
 class KaraokeVideoGenerator:
     """Generates karaoke videos with synced lyrics and word highlighting"""
@@ -31,7 +137,10 @@ class KaraokeVideoGenerator:
         font_size: int = 72,
         font_color: tuple = (255, 255, 255),
         highlight_color: tuple = (255, 255, 0),
-        bg_color: tuple = (0, 0, 0)
+        bg_color: tuple = (0, 0, 0),
+        fast: Optional[bool] = None,
+        workers: Optional[int] = None,
+        render_scale: Optional[float] = None
     ):
         """
         Initialize video generator
@@ -43,7 +152,14 @@ class KaraokeVideoGenerator:
             font_size: Font size for lyrics
             font_color: Default text color (RGB tuple)
             highlight_color: Color for highlighted/active lyrics (RGB tuple)
-            bg_color: Background color (RGB tuple)
+            bg_color: Background color (RGB tuple or colour name)
+            fast: Render with ffmpeg's ASS subtitle filter instead of drawing
+                  frames in Python (defaults to the KARAOKE_FAST env setting)
+            workers: Parts of the video rendered in parallel in frame mode
+                     (defaults to the KARAOKE_RENDER_WORKERS env setting)
+            render_scale: Fraction of the output size frames are drawn at in
+                          frame mode, before ffmpeg scales them up (defaults
+                          to the KARAOKE_RENDER_SCALE env setting)
         """
         self.width = width
         self.height = height
@@ -51,7 +167,28 @@ class KaraokeVideoGenerator:
         self.font_size = font_size
         self.font_color = font_color
         self.highlight_color = highlight_color
-        self.bg_color = bg_color
+        # Resolved once, since the ffmpeg color sources need the RGB values
+        self.bg_color = ImageColor.getcolor(bg_color, 'RGB') if isinstance(bg_color, str) else tuple(bg_color)
+        self.fast = FAST_MODE if fast is None else fast
+        # The subtitle render is drawn by libass at full size
+        self.render_scale = 1.0 if self.fast else (RENDER_SCALE if render_scale is None else render_scale)
+        # Frames are piped as yuv420p, which needs even dimensions
+        self.render_width = int(width * self.render_scale) // 2 * 2
+        self.render_height = int(height * self.render_scale) // 2 * 2
+        # Pillow-SIMD reports versions like 9.5.0.post1
+        logger.debug(f"Pillow {PIL.__version__}")
+        self.workers = max(1, RENDER_WORKERS if workers is None else workers)
+        # FreeType faces aren't safe to share between threads, so parallel
+        # renders take turns rasterizing their lines
+        self._font_lock = threading.Lock()
+        self.font_path = None
+        # Lyrics-independent setup, done by warm_up() or on first use
+        self._codec_args = None
+        # The plain background every frame starts from (read-only)
+        self._bg_template = np.asarray(Image.new('RGB', (self.render_width, self.render_height), self.bg_color))
+        # Pre-rendered layers of recent lines, by (text, next_line), oldest
+        # first; guarded by _font_lock
+        self._layer_cache = OrderedDict()
 
         # Try to load a good font with Unicode/Bengali support
         font_paths = [
@@ -74,7 +211,8 @@ class KaraokeVideoGenerator:
         font_loaded = False
         for font_path in font_paths:
             try:
-                self.font = ImageFont.truetype(font_path, font_size)
+                self.font = _load_font(font_path, self._px(font_size))
+                self.font_path = font_path
                 logger.info(f"Loaded font: {font_path}")
                 font_loaded = True
                 break
@@ -90,13 +228,17 @@ class KaraokeVideoGenerator:
             # Use same font family for preview
             for font_path in font_paths:
                 try:
-                    self.preview_font = ImageFont.truetype(font_path, font_size - 20)
+                    self.preview_font = _load_font(font_path, self._px(font_size - 20))
                     break
                 except:
                     continue
         except:
             self.preview_font = self.font
 
+    def _px(self, size: int) -> int:
+        """A full-size pixel measure at the frame-mode render scale"""
+        return int(round(size * self.render_scale))
+
     def wrap_text(self, text: str, max_width: int) -> list:
         """
         Wrap text to fit within max_width pixels
@@ -115,10 +257,7 @@ class KaraokeVideoGenerator:
         for word in words:
             # Try adding this word to current line
             test_line = ' '.join(current_line + [word])
-            bbox = Image.new('RGB', (1, 1)).getbbox()
-            draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
-            bbox = draw.textbbox((0, 0), test_line, font=self.font)
-            width = bbox[2] - bbox[0]
+            width = _text_width(self.font, test_line)
 
             if width <= max_width:
                 current_line.append(word)
@@ -134,6 +273,113 @@ class KaraokeVideoGenerator:
 
         return lines if lines else [text]
 
+    def _draw_lyrics(self, img: Image.Image, text: str, next_line: str) -> list:
+        """
+        Draw a lyrics line (wrapped and centred) and the next-line preview
+
+        Args:
+            img: Image to draw on
+            text: Current lyrics line
+            next_line: Next line to preview
+
+        Returns:
+            (x, y, line) for each wrapped line, where it was drawn
+        """
+        draw = ImageDraw.Draw(img)
+
+        # Wrap text if too long (use 90% of screen width)
+        max_width = int(self.render_width * 0.9)
+        wrapped_lines = self.wrap_text(text, max_width)
+
+        # Calculate total height for all wrapped lines
+        total_height = 0
+        line_heights = []
+        for line in wrapped_lines:
+            bbox = _text_bbox(self.font, line)
+            line_height = bbox[3] - bbox[1]
+            line_heights.append(line_height)
+            total_height += line_height
+
+        # Add spacing between lines
+        line_spacing = self._px(10)
+        total_height += line_spacing * (len(wrapped_lines) - 1)
+
+        # Start y position (centered vertically)
+        y_start = (self.render_height - total_height) // 2 - self._px(50)
+
+        # Draw each wrapped line
+        current_y = y_start
+        placed = []
+
+        for i, line in enumerate(wrapped_lines):
+            line_width = _text_width(self.font, line)
+            x = (self.render_width - line_width) // 2
+
+            draw.text((x, current_y), line, font=self.font, fill=self.font_color)
+            placed.append((x, current_y, line))
+
+            current_y += line_heights[i] + line_spacing
+
+        # Draw next line preview below (smaller, dimmed)
+        if next_line:
+            # Wrap next line too
+            next_wrapped = self.wrap_text(next_line, max_width)
+            preview_y = current_y + self._px(20)
+
+            for preview_line in next_wrapped[:2]:  # Show max 2 lines of preview
+                preview_bbox = _text_bbox(self.preview_font, preview_line)
+                preview_width = preview_bbox[2] - preview_bbox[0]
+                preview_x = (self.render_width - preview_width) // 2
+
+                # Draw preview in dimmed white (gray)
+                draw.text((preview_x, preview_y), preview_line, font=self.preview_font, fill=(180, 180, 180))
+
+                preview_height = preview_bbox[3] - preview_bbox[1]
+                preview_y += preview_height + self._px(5)
+
+        return placed
+
+    def _line_layers(self, text: str, next_line: str) -> tuple:
+        """
+        Render a lyrics line once unhighlighted and once fully highlighted
+
+        Every frame of the line is cut from these two images, so the glyphs
+        are rasterized twice per line instead of twice per frame.
+
+        Args:
+            text: Current lyrics line
+            next_line: Next line to preview
+
+        Returns:
+            (base, lit, spans): the two frames, and for each wrapped line its
+            highlight span (first character index in text, left, top, bottom,
+            right edge after each prefix of the line)
+        """
+        if not text:
+            return self._bg_template, None, []
+
+        base = Image.new('RGB', (self.render_width, self.render_height), self.bg_color)
+
+        placed = self._draw_lyrics(base, text, next_line)
+
+        # The highlight is drawn over the white text, as a partial overdraw would be
+        lit = base.copy()
+        draw = ImageDraw.Draw(lit)
+        spans = []
+        chars_drawn = 0
+        for x, y, line in placed:
+            draw.text((x, y), line, font=self.font, fill=self.highlight_color)
+            left, top, right, bottom = _text_bbox(self.font, line)
+            left, top, right, bottom = left + x, top + y, right + x, bottom + y
+            edges = [x + math.ceil(self.font.getlength(line[:n])) for n in range(len(line) + 1)]
+            # The last glyph's ink can overhang its advance
+            edges[-1] = max(edges[-1], right)
+            spans.append((chars_drawn, max(min(left, x), 0), max(top, 0), bottom, edges))
+            chars_drawn += len(line) + 1  # +1 for space
+
+        # Frames are assembled from array slices of the two layers
+        return np.asarray(base), np.asarray(lit), spans
+
     def create_frame(
         self,
         text: str,
@@ -151,81 +397,207 @@ class KaraokeVideoGenerator:
         Returns:
             Frame as numpy array
         """
-        # Create blank image
-        img = Image.new('RGB', (self.width, self.height), self.bg_color)
-        draw = ImageDraw.Draw(img)
+        return self._compose_frame(self._layers_for(text, next_line), text, highlight_progress)
 
-        # Calculate text dimensions and position for current line (centered)
-        if text:
-            # Wrap text if too long (use 90% of screen width)
-            max_width = int(self.width * 0.9)
-            wrapped_lines = self.wrap_text(text, max_width)
+    def _layers_for(self, text: str, next_line: str) -> tuple:
+        """
+        Layers of a line (see _line_layers), reusing them when the same line
+        and preview came up recently, as in a repeated chorus
 
-            # Calculate total height for all wrapped lines
-            total_height = 0
-            line_heights = []
-            for line in wrapped_lines:
-                bbox = draw.textbbox((0, 0), line, font=self.font)
-                line_height = bbox[3] - bbox[1]
-                line_heights.append(line_height)
-                total_height += line_height
+        Args:
+            text: Current lyrics line
+            next_line: Next line to preview
 
-            # Add spacing between lines
-            line_spacing = 10
-            total_height += line_spacing * (len(wrapped_lines) - 1)
+        Returns:
+            (base, lit, spans) from _line_layers
+        """
+        key = (text, next_line)
+        with self._font_lock:
+            layers = self._layer_cache.get(key)
+            if layers is None:
+                layers = self._line_layers(text, next_line)
+                self._layer_cache[key] = layers
+                if len(self._layer_cache) > LAYER_CACHE_SIZE:
+                    self._layer_cache.popitem(last=False)
+            else:
+                self._layer_cache.move_to_end(key)
+        return layers
+
+    @staticmethod
+    def _compose_frame(layers: tuple, text: str, highlight_progress: float) -> np.ndarray:
+        """
+        Build a frame from a line's layers (see _line_layers)
 
-            # Start y position (centered vertically)
-            y_start = (self.height - total_height) // 2 - 50
+        Args:
+            layers: (base, lit, spans) from _line_layers
+            text: The line the layers were rendered from
+            highlight_progress: Progress of highlighting (0.0 to 1.0)
+
+        Returns:
+            Frame as numpy array
+        """
+        base, lit, spans = layers
+        frame = base.copy()
+        chars_to_highlight = int(len(text) * highlight_progress)
+
+        # Copy the highlighted part of each wrapped line over from the lit layer
+        for first_char, left, top, bottom, edges in spans:
+            line_highlight_chars = min(chars_to_highlight - first_char, len(edges) - 1)
+            if line_highlight_chars > 0:
+                right = edges[line_highlight_chars]
+                frame[top:bottom, left:right] = lit[top:bottom, left:right]
+
+        return frame
+
+    @staticmethod
+    def _ass_time(seconds: float) -> str:
+        """Format seconds as an ASS timestamp (H:MM:SS.cc)"""
+        centiseconds = int(round(max(seconds, 0) * 100))
+        hours, centiseconds = divmod(centiseconds, 360000)
+        minutes, centiseconds = divmod(centiseconds, 6000)
+        secs, centiseconds = divmod(centiseconds, 100)
+        return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+    @staticmethod
+    def _ass_color(rgb: tuple) -> str:
+        """Convert an RGB tuple to an ASS color (&HAABBGGRR)"""
+        r, g, b = rgb
+        return f"&H00{b:02X}{g:02X}{r:02X}"
+
+    @staticmethod
+    def _ass_escape(text: str) -> str:
+        """Keep lyrics from being read as ASS override tags or line breaks"""
+        return (text
+            .replace('\\', '\u2216')
+            .replace('{', '(').replace('}', ')')
+            .replace('\n', ' '))
+
+    def _karaoke_text(self, text: str, duration: float) -> str:
+        """
+        Add \\kf sweep tags to a line, giving each word a share of the line
+        duration proportional to its length (like the frame renderer's
+        character-based highlight)
 
-            # Draw each wrapped line
-            current_y = y_start
-            chars_drawn = 0
+        Args:
+            text: Lyrics line
+            duration: Line duration in seconds
 
-            for i, line in enumerate(wrapped_lines):
-                bbox = draw.textbbox((0, 0), line, font=self.font)
-                line_width = bbox[2] - bbox[0]
-                x = (self.width - line_width) // 2
+        Returns:
+            Line with karaoke tags
+        """
+        words = text.split()
+        if not words:
+            return ''
+
+        total_chars = sum(len(word) + 1 for word in words)
+        total_cs = int(round(duration * 100))
+        tagged = []
+        elapsed_chars = 0
+        elapsed_cs = 0
+        for word in words:
+            elapsed_chars += len(word) + 1
+            word_end = total_cs * elapsed_chars // total_chars
+            tagged.append(f"{{\\kf{word_end - elapsed_cs}}}{self._ass_escape(word)}")
+            elapsed_cs = word_end
 
-                # Draw the full line in white first
-                draw.text((x, current_y), line, font=self.font, fill=self.font_color)
+        return ' '.join(tagged)
 
-                # Calculate highlighting for this line
-                chars_in_line = len(line)
-                total_chars = len(text)
-                chars_to_highlight = int(total_chars * highlight_progress)
+    def write_ass(self, lyrics_data: Dict, ass_path: str):
+        """
+        Write the lyrics as an ASS subtitle file with karaoke highlighting
 
-                if chars_to_highlight > chars_drawn:
-                    # Some of this line should be highlighted
-                    line_highlight_chars = min(chars_to_highlight - chars_drawn, chars_in_line)
-                    highlighted_text = line[:line_highlight_chars]
+        Args:
+            lyrics_data: Lyrics dictionary from LyricsExtractor
+            ass_path: Path to save the .ass file
+        """
+        font_name = self.font.getname()[0] if self.font_path else 'Arial'
+        preview_size = self.font_size - 20
+        margin = int(self.width * 0.05)
+        center_x = self.width // 2
+        center_y = self.height // 2 - 50
+
+        lines = [
+            '[Script Info]',
+            'ScriptType: v4.00+',
+            f'PlayResX: {self.width}',
+            f'PlayResY: {self.height}',
+            'WrapStyle: 0',
+            'ScaledBorderAndShadow: yes',
+            '',
+            '[V4+ Styles]',
+            'Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, '
+            'BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, '
+            'BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding',
+            # \kf sweeps from SecondaryColour (unsung) to PrimaryColour (sung)
+            f'Style: Default,{font_name},{self.font_size},{self._ass_color(self.highlight_color)},'
+            f'{self._ass_color(self.font_color)},&H00000000,&H00000000,0,0,0,0,100,100,0,0,'
+            f'1,0,0,2,{margin},{margin},0,1',
+            f'Style: Preview,{font_name},{preview_size},{self._ass_color((180, 180, 180))},'
+            f'{self._ass_color((180, 180, 180))},&H00000000,&H00000000,0,0,0,0,100,100,0,0,'
+            f'1,0,0,8,{margin},{margin},0,1',
+            '',
+            '[Events]',
+            'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+        ]
 
-                    # Draw highlighted portion in yellow
-                    draw.text((x, current_y), highlighted_text, font=self.font, fill=self.highlight_color)
+        segments = lyrics_data['segments']
+        for i, segment in enumerate(segments):
+            start = segment['start']
+            end = segment['end']
+            text = segment['text'].strip()
+            if not text or end <= start:
+                continue
 
-                chars_drawn += chars_in_line + 1  # +1 for space
+            times = f"{self._ass_time(start)},{self._ass_time(end)}"
+            lines.append(
+                f"Dialogue: 0,{times},Default,,0,0,0,,"
+                f"{{\\pos({center_x},{center_y})}}{self._karaoke_text(text, end - start)}"
+            )
 
-                current_y += line_heights[i] + line_spacing
+            # Next line preview below the current one
+            if i + 1 < len(segments):
+                next_line = segments[i + 1]['text'].strip()
+                if next_line:
+                    lines.append(
+                        f"Dialogue: 0,{times},Preview,,0,0,0,,"
+                        f"{{\\pos({center_x},{center_y + 30})}}{self._ass_escape(next_line)}"
+                    )
 
-            # Draw next line preview below (smaller, dimmed)
-            if next_line:
-                # Wrap next line too
-                next_wrapped = self.wrap_text(next_line, max_width)
-                preview_y = current_y + 20
+        with open(ass_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
 
-                for preview_line in next_wrapped[:2]:  # Show max 2 lines of preview
-                    preview_bbox = draw.textbbox((0, 0), preview_line, font=self.preview_font)
-                    preview_width = preview_bbox[2] - preview_bbox[0]
-                    preview_x = (self.width - preview_width) // 2
+    def warm_up(self):
+        """
+        Do the setup generate() needs that doesn't depend on the lyrics (the
+        encoder probe), so a caller can run it while the lyrics are still
+        being edited
+        """
+        self._video_codec_args()
 
-                    # Draw preview in dimmed white (gray)
-                    draw.text((preview_x, preview_y), preview_line, font=self.preview_font, fill=(180, 180, 180))
+    def _video_codec_args(self) -> List[str]:
+        """
+        Encoder arguments: NVENC when a CUDA GPU and an NVENC-enabled ffmpeg
+        exist, else x264 at constant quality (the mostly flat lyric frames
+        need far less than a fixed bitrate). Every part of a frame-mode video
+        uses the same arguments, so the parts can be joined by stream copy.
+        """
+        if self._codec_args is None:
+            from utils import resolve_device
 
-                    preview_height = preview_bbox[3] - preview_bbox[1]
-                    preview_y += preview_height + 5
+            keyframes = ['-g', str(self.fps * 2)]
+            self._codec_args = [
+                '-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'stillimage', '-crf', '20', *keyframes
+            ]
+            if resolve_device('auto') == 'cuda':
+                encoders = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True
+                ).stdout
+                if 'h264_nvenc' in encoders:
+                    self._codec_args = ['-c:v', 'h264_nvenc', '-preset', 'p4', '-b:v', '5000k', *keyframes]
 
-        return np.array(img)
+        return self._codec_args
 
-    def generate(
+    def generate_fast(
         self,
         audio_path: str,
         lyrics_data: Dict,
@@ -233,7 +605,8 @@ class KaraokeVideoGenerator:
         title: Optional[str] = None
     ):
         """
-        Generate karaoke video
+        Generate karaoke video in one ffmpeg pass, with the lyrics burned in
+        by libass over a solid background
 
         Args:
             audio_path: Path to instrumental audio
@@ -241,133 +614,318 @@ class KaraokeVideoGenerator:
             output_path: Path to save output video
             title: Optional song title to display
         """
-        logger.info("Generating karaoke video...")
+        logger.info("Generating karaoke video (fast subtitle render)...")
         logger.info(f"Audio: {audio_path}")
         logger.info(f"Output: {output_path}")
 
-        # Create temporary directory for segment videos
         temp_dir = tempfile.mkdtemp()
 
         try:
-            # Load audio
-            audio = AudioFileClip(audio_path)
-            duration = audio.duration
-
-            logger.info(f"Creating {len(lyrics_data['segments'])} lyrics segments...")
-
-            segment_files = []
-
-            # Create video segments for each lyrics line
-            for i, segment in enumerate(lyrics_data['segments']):
-                text = segment['text']
-                start = segment['start']
-                end = segment['end']
-                segment_duration = end - start
-
-                # Get next line for preview
-                next_line = ""
-                if i + 1 < len(lyrics_data['segments']):
-                    next_line = lyrics_data['segments'][i + 1]['text']
-
-                # Create frames for this segment
-                num_frames = max(int(segment_duration * self.fps), 1)
-                frames = []
-
-                for frame_idx in range(num_frames):
-                    # Calculate highlight progress (0.0 to 1.0)
-                    progress = frame_idx / max(num_frames - 1, 1)
-                    frame = self.create_frame(text, progress, next_line)
-                    frames.append(Image.fromarray(frame.astype('uint8'), 'RGB'))
-
-                # Save frames as a video segment using PIL and FFmpeg
-                segment_file = os.path.join(temp_dir, f'segment_{i:04d}.mp4')
-                frame_pattern = os.path.join(temp_dir, f'seg{i:04d}_%04d.png')
-
-                # Save frames as images
-                for fidx, frame in enumerate(frames):
-                    frame.save(frame_pattern % fidx)
-
-                # Use FFmpeg to create video segment from frames
-                ffmpeg_cmd = [
-                    'ffmpeg', '-y',
-                    '-framerate', str(self.fps),
-                    '-i', frame_pattern,
-                    '-c:v', 'libx264',
-                    '-pix_fmt', 'yuv420p',
-                    '-preset', 'fast',
-                    segment_file
-                ]
-                subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
-
-                # Clean up frame images
-                for fidx in range(len(frames)):
-                    os.remove(frame_pattern % fidx)
+            ass_path = os.path.join(temp_dir, 'lyrics.ass')
+            self.write_ass(lyrics_data, ass_path)
 
-                segment_files.append((segment_file, start, end))
+            subtitle_filter = f"ass=filename='{ass_path}'"
+            if self.font_path:
+                subtitle_filter += f":fontsdir='{Path(self.font_path).parent}'"
 
-            # Create full-duration background video
-            logger.info("Creating background video...")
-            background_frame = self.create_frame("", 0.0, "")
-            bg_image = Image.fromarray(background_frame.astype('uint8'), 'RGB')
-            bg_path = os.path.join(temp_dir, 'background.png')
-            bg_image.save(bg_path)
+            # The color source is endless; end it where frame mode's last
+            # frame would be, since -shortest alone overshoots the audio
+            video_seconds = int(_audio_duration(audio_path) * self.fps) / self.fps
 
-            bg_video_path = os.path.join(temp_dir, 'background.mp4')
-            ffmpeg_bg_cmd = [
+            ffmpeg_cmd = [
                 'ffmpeg', '-y',
-                '-loop', '1',
-                '-i', bg_path,
-                '-t', str(duration),
-                '-c:v', 'libx264',
+                '-f', 'lavfi',
+                '-i', f"{self._color_source()}:d={video_seconds}",
+                '-i', audio_path,
+                '-map', '0:v', '-map', '1:a',
+                '-vf', subtitle_filter,
+                *self._video_codec_args(),
                 '-pix_fmt', 'yuv420p',
-                '-r', str(self.fps),
-                bg_video_path
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                '-shortest',
+                output_path
             ]
-            subprocess.run(ffmpeg_bg_cmd, check=True, capture_output=True)
-
-            # Load all video clips
-            logger.info("Compositing video segments...")
-            background_clip = VideoFileClip(bg_video_path)
-            clips = [background_clip]
-
-            for seg_file, start, end in segment_files:
-                seg_clip = VideoFileClip(seg_file).with_start(start)
-                clips.append(seg_clip)
-
-            # Composite video
-            final_video = CompositeVideoClip(clips, size=(self.width, self.height))
-            final_video = final_video.with_audio(audio)
-
-            # Write final video
-            logger.info("Rendering final video (this may take 3-5 minutes)...")
-            final_video.write_videofile(
-                output_path,
-                fps=self.fps,
-                codec='libx264',
-                audio_codec='aac',
-                bitrate='5000k',
-                threads=4,
-                preset='medium'
-            )
+            subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+
+            logger.info(f"Karaoke video created successfully: {output_path}")
+
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error generating video: {e.stderr.decode(errors='replace')[-2000:]}")
+            raise
+        except Exception as e:
+            logger.error(f"Error generating video: {e}")
+            raise
+        finally:
+            import shutil
+            try:
+                shutil.rmtree(temp_dir)
+            except:
+                pass
+
+    def generate(
+        self,
+        audio_path: str,
+        lyrics_data: Dict,
+        output_path: str,
+        title: Optional[str] = None
+    ):
+        """
+        Generate karaoke video
+
+        Args:
+            audio_path: Path to instrumental audio
+            lyrics_data: Lyrics dictionary from LyricsExtractor
+            output_path: Path to save output video
+            title: Optional song title to display
+        """
+        if self.fast:
+            return self.generate_fast(audio_path, lyrics_data, output_path, title)
+
+        logger.info("Generating karaoke video...")
+        logger.info(f"Audio: {audio_path}")
+        logger.info(f"Output: {output_path}")
 
-            # Clean up
-            final_video.close()
-            background_clip.close()
-            audio.close()
+        duration = _audio_duration(audio_path)
+
+        segments = sorted(lyrics_data['segments'], key=lambda segment: segment['start'])
+        logger.info(f"Rendering {len(segments)} lyrics segments...")
+
+        # Each line is shown for the same frames the per-segment clips used
+        # to cover; where lines overlap the later one wins, as it did on top
+        # of the composite
+        first_frames = [int(round(segment['start'] * self.fps)) for segment in segments]
+        frame_counts = [
+            max(int((segment['end'] - segment['start']) * self.fps), 1) for segment in segments
+        ]
+        timeline = (segments, first_frames, frame_counts)
+
+        # The timeline is cut into contiguous parts that are rendered and
+        # encoded side by side, then joined without re-encoding
+        parts = self._plan_parts(first_frames, frame_counts, int(duration * self.fps))
+
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            logger.info(f"Rendering final video in {len(parts)} part(s) (this may take 3-5 minutes)...")
+            part_paths = [os.path.join(temp_dir, f'part_{n:04d}.mp4') for n in range(len(parts))]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                renders = [
+                    pool.submit(self._render_gap, last - first, path) if is_gap
+                    else pool.submit(self._render_span, timeline, first, last, path)
+                    for (first, last, is_gap), path in zip(parts, part_paths)
+                ]
+                for render in renders:
+                    render.result()
+
+            list_path = os.path.join(temp_dir, 'parts.txt')
+            with open(list_path, 'w') as f:
+                f.writelines(f"file '{path}'\n" for path in part_paths)
+
+            ffmpeg_cmd = [
+                'ffmpeg', '-y', '-v', 'error',
+                '-f', 'concat', '-safe', '0',
+                '-i', list_path,
+                '-i', audio_path,
+                '-map', '0:v', '-map', '1:a',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-shortest',
+                output_path
+            ]
+            subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
 
             logger.info(f"Karaoke video created successfully: {output_path}")
 
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error generating video: {e.stderr.decode(errors='replace')[-2000:]}")
+            raise
         except Exception as e:
             logger.error(f"Error generating video: {e}")
             raise
         finally:
-            # Clean up temporary files
             import shutil
             try:
                 shutil.rmtree(temp_dir)
             except:
                 pass
 
+    def _plan_parts(self, first_frames: List[int], frame_counts: List[int], total_frames: int) -> List[tuple]:
+        """
+        Cut the song's frames into parts to encode separately
+
+        Long gaps between lines become parts of their own; the lyric stretches
+        between them are split so the workers get similar amounts of work.
+
+        Args:
+            first_frames: First frame of each line, in order
+            frame_counts: Frames each line is shown for
+            total_frames: Frames in the song
+
+        Returns:
+            (first, last, is_gap) for each part, in order
+        """
+        # Frames each line actually owns (a later line takes over on overlap)
+        shown = []
+        for i, (first, count) in enumerate(zip(first_frames, frame_counts)):
+            last = first + count
+            if i + 1 < len(first_frames):
+                last = min(last, first_frames[i + 1])
+            first, last = max(first, 0), min(last, total_frames)
+            if first < last:
+                shown.append((first, last))
+
+        # Long gaps between the shown lines (and before the first and after
+        # the last); the lyric stretches are everything in between
+        min_gap = max(int(MIN_GAP_SECONDS * self.fps), 1)
+        gaps = []
+        position = 0
+        for first, last in shown + [(total_frames, total_frames)]:
+            if first - position >= min_gap:
+                gaps.append((position, first))
+            position = max(position, last)
+
+        stretches = []
+        position = 0
+        for first, last in gaps + [(total_frames, total_frames)]:
+            if first > position:
+                stretches.append((position, first))
+            position = last
+
+        # Split long stretches so each worker gets a similar share
+        lyric_frames = sum(last - first for first, last in stretches)
+        max_part = max(MIN_SPAN_FRAMES, -(-lyric_frames // self.workers))
+        parts = [(first, last, True) for first, last in gaps]
+        for first, last in stretches:
+            count = -(-(last - first) // max_part)
+            parts.extend(
+                (first + (last - first) * n // count, first + (last - first) * (n + 1) // count, False)
+                for n in range(count)
+            )
+
+        return sorted(parts)
+
+    def _render_gap(self, frame_count: int, path: str):
+        """
+        Encode frame_count frames of the plain background (video only),
+        generated by ffmpeg itself
+
+        Args:
+            frame_count: Number of frames
+            path: Output video path
+        """
+        ffmpeg_cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'lavfi',
+            '-i', self._color_source(),
+            '-frames:v', str(frame_count),
+            *self._video_codec_args(),
+            '-pix_fmt', 'yuv420p',
+            path
+        ]
+        subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
+
+    def _color_source(self) -> str:
+        """lavfi source of plain background frames at the output size"""
+        r, g, b = self.bg_color
+        return f"color=c=0x{r:02X}{g:02X}{b:02X}:s={self.width}x{self.height}:r={self.fps}"
+
+    def _upscale_args(self) -> List[str]:
+        """ffmpeg filter arguments taking rendered frames to the output size"""
+        if (self.render_width, self.render_height) == (self.width, self.height):
+            return []
+        return ['-vf', f'scale={self.width}:{self.height}:flags=lanczos']
+
+    def _render_span(self, timeline: tuple, first: int, last: int, path: str):
+        """
+        Render frames [first, last) of the song and encode them (video only)
+
+        Frames go straight into one ffmpeg process as raw yuv420p: each
+        line's layers are converted once, and frames are assembled in YUV, so
+        the pipe carries half the bytes of RGB and ffmpeg has nothing to
+        convert.
+
+        Args:
+            timeline: (segments sorted by start, first frame of each, frame count of each)
+            first: First frame to render
+            last: Frame to stop before
+            path: Output video path
+        """
+        segments, first_frames, frame_counts = timeline
+        size = (self.render_width, self.render_height)
+        background = _to_yuv420(self._bg_template)
+        # Every frame is built in this one buffer, which goes to the pipe as-is
+        canvas = np.empty_like(background)
+        canvas_planes = _yuv_planes(canvas, *size)
+
+        ffmpeg_cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'yuv420p',
+            '-s', f'{self.render_width}x{self.render_height}',
+            '-r', str(self.fps),
+            '-i', '-',
+            *self._upscale_args(),
+            *self._video_codec_args(),
+            '-pix_fmt', 'yuv420p',
+            path
+        ]
+        process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        try:
+            layers_key = None
+            # What the canvas currently shows; frames that highlight the same
+            # characters of the same line are sent again without rebuilding
+            canvas_key = None
+            for frame_idx in range(first, last):
+                i = bisect.bisect_right(first_frames, frame_idx) - 1
+                offset = frame_idx - first_frames[i] if i >= 0 else 0
+                if i < 0 or offset >= frame_counts[i]:
+                    process.stdin.write(background)
+                    continue
+
+                text = segments[i]['text']
+                next_line = segments[i + 1]['text'] if i + 1 < len(segments) else ""
+                if layers_key != (text, next_line):
+                    base, lit, spans = self._layers_for(text, next_line)
+                    base = _to_yuv420(base)
+                    lit_planes = _yuv_planes(_to_yuv420(lit), *size) if lit is not None else None
+                    layers_key = (text, next_line)
+
+                # Calculate highlight progress (0.0 to 1.0)
+                progress = offset / max(frame_counts[i] - 1, 1)
+                chars_to_highlight = int(len(text) * progress)
+                if canvas_key == (layers_key, chars_to_highlight):
+                    process.stdin.write(canvas)
+                    continue
+                canvas_key = (layers_key, chars_to_highlight)
+
+                # As in _compose_frame, with the chroma boxes at half size
+                np.copyto(canvas, base)
+                for first_char, left, top, bottom, edges in spans:
+                    line_highlight_chars = min(chars_to_highlight - first_char, len(edges) - 1)
+                    if line_highlight_chars > 0:
+                        right = edges[line_highlight_chars]
+                        for step, plane, lit_plane in zip((1, 2, 2), canvas_planes, lit_planes):
+                            rows = slice(top // step, -(-bottom // step))
+                            cols = slice(left // step, -(-right // step))
+                            plane[rows, cols] = lit_plane[rows, cols]
+
+                process.stdin.write(canvas)
+        except BrokenPipeError:
+            # ffmpeg exited early; its error output says why
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            stderr = process.stderr.read()
+            process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, ffmpeg_cmd, stderr=stderr)
+
 
 def generate_karaoke_video(
     audio_path: str,
@@ -390,6 +948,7 @@ def generate_karaoke_video(
 
 if __name__ == '__main__':
     # Test the generator
+    logging.basicConfig(level=logging.INFO)
     import sys
     import json
 
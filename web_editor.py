@@ -2,15 +2,16 @@
 Web-based lyrics timing editor for karaoke maker
 Provides interactive UI for syncing lyrics with audio
 """
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, g, render_template, request, jsonify, send_file
 from pathlib import Path
 import json
 import logging
+import os
+import uuid
 from typing import Dict, List
-from downloader import YouTubeDownloader
-from separator import VocalSeparator
-from lyrics_extractor import LyricsExtractor
-from video_generator import KaraokeVideoGenerator
+from pipeline import TEMP_DIR, get_downloader, get_generator, get_separator, load_or_extract_lyrics
+from session_store import SESSION_COOKIE, SessionStore, StoredSession
+from utils import karaoke_filename
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,18 +19,32 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 
 # Directories
-TEMP_DIR = Path('/tmp/karaoke-temp')
 OUTPUT_DIR = Path.home() / 'Downloads'
-TEMP_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Global state for current session
-current_session = {
+# Per-browser session state, keyed by a cookie and kept in sqlite
+# so concurrent editors don't overwrite each other's tracks and lyrics
+sessions = SessionStore(TEMP_DIR / 'editor_sessions.db', defaults={
     'audio_path': None,
     'instrumental_path': None,
     'title': None,
     'lyrics': []
-}
+})
+
+
+def current_session() -> StoredSession:
+    """Return the session of the requesting browser, starting one if needed"""
+    if 'sid' not in g:
+        g.sid = request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+    return sessions.get(g.sid)
+
+
+@app.after_request
+def set_session_cookie(response):
+    """Hand a new session id to browsers that don't have one yet"""
+    if 'sid' in g and request.cookies.get(SESSION_COOKIE) != g.sid:
+        response.set_cookie(SESSION_COOKIE, g.sid, httponly=True, samesite='Lax')
+    return response
 
 
 @app.route('/')
@@ -41,6 +56,7 @@ def index():
 @app.route('/api/download', methods=['POST'])
 def download_youtube():
     """Download audio from YouTube URL"""
+    session = current_session()
     try:
         data = request.json
         youtube_url = data.get('url')
@@ -49,11 +65,11 @@ def download_youtube():
             return jsonify({'error': 'No URL provided'}), 400
 
         logger.info(f"Downloading: {youtube_url}")
-        downloader = YouTubeDownloader(TEMP_DIR)
+        downloader = get_downloader()
         result = downloader.download(youtube_url)
 
-        current_session['audio_path'] = result['audio_path']
-        current_session['title'] = result['title']
+        session['audio_path'] = result['audio_path']
+        session['title'] = result['title']
 
         return jsonify({
             'success': True,
@@ -69,15 +85,16 @@ def download_youtube():
 @app.route('/api/separate', methods=['POST'])
 def separate_vocals():
     """Separate vocals from audio"""
+    session = current_session()
     try:
-        if not current_session['audio_path']:
+        if not session['audio_path']:
             return jsonify({'error': 'No audio loaded'}), 400
 
         logger.info("Separating vocals...")
-        separator = VocalSeparator(TEMP_DIR)
-        result = separator.separate(current_session['audio_path'])
+        separator = get_separator()
+        result = separator.separate(session['audio_path'])
 
-        current_session['instrumental_path'] = result['instrumental']
+        session['instrumental_path'] = result['instrumental']
 
         return jsonify({
             'success': True,
@@ -92,13 +109,13 @@ def separate_vocals():
 @app.route('/api/extract-lyrics', methods=['POST'])
 def extract_lyrics():
     """Extract lyrics using Whisper"""
+    session = current_session()
     try:
-        if not current_session['audio_path']:
+        if not session['audio_path']:
             return jsonify({'error': 'No audio loaded'}), 400
 
         logger.info("Extracting lyrics...")
-        extractor = LyricsExtractor()
-        result = extractor.extract(current_session['audio_path'])
+        result = load_or_extract_lyrics(session['audio_path'])
 
         # Convert to simpler format for frontend
         lyrics = []
@@ -109,7 +126,7 @@ def extract_lyrics():
                 'text': segment['text']
             })
 
-        current_session['lyrics'] = lyrics
+        session['lyrics'] = lyrics
 
         return jsonify({
             'success': True,
@@ -125,11 +142,12 @@ def extract_lyrics():
 @app.route('/api/update-lyrics', methods=['POST'])
 def update_lyrics():
     """Update lyrics timing and text"""
+    session = current_session()
     try:
         data = request.json
         lyrics = data.get('lyrics', [])
 
-        current_session['lyrics'] = lyrics
+        session['lyrics'] = lyrics
 
         return jsonify({'success': True})
 
@@ -141,11 +159,12 @@ def update_lyrics():
 @app.route('/api/generate', methods=['POST'])
 def generate_video():
     """Generate final karaoke video"""
+    session = current_session()
     try:
-        if not current_session['instrumental_path']:
+        if not session['instrumental_path']:
             return jsonify({'error': 'No instrumental track'}), 400
 
-        if not current_session['lyrics']:
+        if not session['lyrics']:
             return jsonify({'error': 'No lyrics'}), 400
 
         logger.info("Generating karaoke video...")
@@ -158,16 +177,19 @@ def generate_video():
                     'end': lyric['end'],
                     'text': lyric['text']
                 }
-                for lyric in current_session['lyrics']
+                for lyric in session['lyrics']
             ]
         }
 
-        generator = KaraokeVideoGenerator()
-        output_path = generator.generate(
-            audio_path=current_session['instrumental_path'],
+        # Create output path
+        output_path = OUTPUT_DIR / karaoke_filename(session['title'])
+
+        generator = get_generator()
+        generator.generate(
+            audio_path=session['instrumental_path'],
             lyrics_data=lyrics_data,
-            output_dir=OUTPUT_DIR,
-            title=current_session['title']
+            output_path=str(output_path),
+            title=session['title']
         )
 
         return jsonify({
@@ -196,11 +218,12 @@ def serve_audio(filename):
 @app.route('/api/session')
 def get_session():
     """Get current session state"""
+    session = current_session()
     return jsonify({
-        'title': current_session['title'],
-        'audio_path': current_session['audio_path'],
-        'instrumental_path': current_session['instrumental_path'],
-        'lyrics': current_session['lyrics']
+        'title': session['title'],
+        'audio_path': session['audio_path'],
+        'instrumental_path': session['instrumental_path'],
+        'lyrics': session['lyrics']
     })
 
 
@@ -213,4 +236,12 @@ if __name__ == '__main__':
     print("\nPress Ctrl+C to stop the server")
     print("="*70 + "\n")
 
-    app.run(debug=True, port=5001)
+    if os.getenv('FLASK_DEBUG', '0') == '1':
+        # The debugger and reloader wrap every request and fork a second
+        # process that loads the models again, so they are opt-in
+        app.run(debug=True, port=5001, threaded=True)
+    else:
+        # Waitress runs each request on its own worker thread, so one
+        # editor's separation or render doesn't hold up the others
+        from waitress import serve
+        serve(app, host=os.getenv('HOST', '127.0.0.1'), port=5001, threads=8)